@@ -81,6 +81,7 @@ class Settings(BaseSettings):
     import_zip_max_files: int = Field(default=12000, validation_alias="IMPORT_ZIP_MAX_FILES")
     import_zip_max_entry_bytes: int = Field(default=750_000_000, validation_alias="IMPORT_ZIP_MAX_ENTRY_BYTES")
     import_zip_max_compression_ratio: int = Field(default=250, validation_alias="IMPORT_ZIP_MAX_COMPRESSION_RATIO")
+    import_zip_in_memory_max_bytes: int = Field(default=128 * 1024 * 1024, validation_alias="IMPORT_ZIP_IN_MEMORY_MAX_BYTES")
 
     openrouter_enabled: bool = Field(default=False, validation_alias="OPENROUTER_ENABLED")
     openrouter_base_url: str = Field(default="https://openrouter.ai/api/v1", validation_alias="OPENROUTER_BASE_URL")
@@ -106,6 +107,8 @@ class Settings(BaseSettings):
     openrouter_timeout_read: float = Field(default=15.0, validation_alias="OPENROUTER_TIMEOUT_READ")
     openrouter_timeout_write: float = Field(default=15.0, validation_alias="OPENROUTER_TIMEOUT_WRITE")
     openrouter_temperature: float = Field(default=0.2, validation_alias="OPENROUTER_TEMPERATURE")
+    openrouter_hedge_enabled: bool = Field(default=False, validation_alias="OPENROUTER_HEDGE_ENABLED")
+    openrouter_max_rps: int = Field(default=2, validation_alias="OPENROUTER_MAX_RPS")
 
     ollama_enabled: bool = Field(default=False, validation_alias="OLLAMA_ENABLED")
     ollama_base_url: str = Field(default="http://localhost:11434", validation_alias="OLLAMA_BASE_URL")
@@ -1,9 +1,24 @@
 from __future__ import annotations
 
+import threading
+
 import redis
 
 from app.core.config import settings
 
+_pool: redis.ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> redis.ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = redis.ConnectionPool.from_url(settings.redis_url, decode_responses=True)
+    return _pool
+
 
 def get_redis() -> redis.Redis:
-    return redis.Redis.from_url(settings.redis_url, decode_responses=True)
+    # Shared pool: callers get str values and reuse connections across calls.
+    return redis.Redis(connection_pool=_get_pool())
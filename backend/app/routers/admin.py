@@ -5,6 +5,7 @@ import re
 import uuid
 import asyncio
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import secrets
 import string
@@ -67,6 +68,7 @@ from app.schemas.me import HistoryResponse
 from app.services.learning import LearningService
 from app.core.queue import fetch_job, get_queue
 from app.services.module_import_jobs import import_module_zip_job
+from app.services.module_importer import load_uploaded_keys
 from app.services.content_migration_jobs import migrate_legacy_submodule_content_job
 from app.services.quiz_regeneration_jobs import regenerate_module_quizzes_job, regenerate_submodule_quiz_job
 from app.services.llm_handler import generate_quiz_questions_ai
@@ -156,6 +158,13 @@ def _delete_s3_prefix_best_effort(*, prefix: str) -> None:
         return
 
 
+def _safe_healthcheck(fn, /, **kwargs) -> tuple[bool, str | None]:
+    try:
+        return fn(**kwargs)
+    except Exception:
+        return False, None
+
+
 @router.get("/system/status")
 def system_status(
     db: Session = Depends(get_db),
@@ -210,6 +219,22 @@ def system_status(
         "openrouter": {"enabled": bool(eff_or_enabled), "ok": False, "reason": None},
     }
 
+    # Provider healthchecks are network-bound; run them concurrently with the
+    # local checks below so the endpoint costs max(...) instead of sum(...).
+    hc_pool = ThreadPoolExecutor(max_workers=2)
+    f_ollama = hc_pool.submit(
+        _safe_healthcheck,
+        ollama_healthcheck,
+        enabled=bool(eff_ollama_enabled),
+        base_url=str(eff_ollama_base_url or "").strip() or None,
+    )
+    f_or = hc_pool.submit(
+        _safe_healthcheck,
+        openrouter_healthcheck,
+        base_url=str(eff_or_base_url or "").strip() or None,
+    )
+    hc_pool.shutdown(wait=False)
+
     try:
         db.execute(text("SELECT 1"))
         out["db"] = {"ok": True}
@@ -248,10 +273,7 @@ def system_status(
     except Exception:
         out["rq"] = {"ok": False, "workers": 0, "queued": 0, "started": 0, "failed": 0, "deferred": 0, "scheduled": 0}
 
-    ok, reason = ollama_healthcheck(
-        enabled=bool(eff_ollama_enabled),
-        base_url=str(eff_ollama_base_url or "").strip() or None,
-    )
+    ok, reason = f_ollama.result()
     out["ollama"] = {
         "enabled": bool(eff_ollama_enabled),
         "ok": bool(ok),
@@ -279,7 +301,7 @@ def system_status(
         "model": eff_hf_model,
     }
 
-    ok_or, reason_or = openrouter_healthcheck(base_url=str(eff_or_base_url or "").strip() or None)
+    ok_or, reason_or = f_or.result()
     out["openrouter"] = {
         "enabled": bool(eff_or_enabled),
         "ok": bool(ok_or),
@@ -1970,10 +1992,7 @@ def cancel_job(
     # Product requirement: upload to storage first, then allow resume/enqueue without re-upload.
 
     # Best-effort cleanup of any objects uploaded by the job during import.
-    try:
-        uploaded_keys = list((job.meta or {}).get("uploaded_keys") or [])
-    except Exception:
-        uploaded_keys = []
+    uploaded_keys = load_uploaded_keys(job)
     if uploaded_keys:
         try:
             ensure_bucket_exists()
@@ -3930,6 +3949,7 @@ def reset_user_password(
 @router.get("/analytics/modules/{module_id}", response_model=ModuleAnalyticsResponse)
 def module_analytics(
     module_id: str,
+    include_inactive: bool = False,
     db: Session = Depends(get_db),
     _: User = Depends(require_roles(UserRole.admin)),
 ):
@@ -3939,7 +3959,7 @@ def module_analytics(
         raise HTTPException(status_code=404, detail="module not found")
 
     learning_service = LearningService(db)
-    rows = learning_service.get_modules_analytics_batch(mid)
+    rows = learning_service.get_modules_analytics_batch(mid, include_inactive=bool(include_inactive))
 
     return {"module_id": str(m.id), "module_title": m.title, "rows": rows}
 
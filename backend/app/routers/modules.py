@@ -15,7 +15,7 @@ from app.models.user import User
 from app.schemas.modules_overview import ModulesOverviewResponse
 from app.schemas.module import ModulePublic, SubmoduleAssetsResponse, SubmodulePublic
 from app.services.modules import ModuleService
-from app.services.storage import s3_prefix_has_objects
+from app.services.storage import s3_prefix_has_objects, s3_prefixes_have_objects
 
 router = APIRouter(prefix="/modules", tags=["modules"])
 
@@ -30,7 +30,8 @@ def modules_overview(db: Session = Depends(get_db), user: User = Depends(get_cur
 @router.get("", response_model=list[ModulePublic])
 def list_modules(db: Session = Depends(get_db), _: User = Depends(get_current_user)):
     modules = db.scalars(select(Module).where(Module.is_active == True).order_by(Module.title)).all()  # noqa: E712
-    modules = [m for m in modules if s3_prefix_has_objects(prefix=f"modules/{m.id}/")]
+    has_objects = s3_prefixes_have_objects(prefixes=[f"modules/{m.id}/" for m in modules])
+    modules = [m for m in modules if has_objects.get(f"modules/{m.id}/")]
     return [
         {
             "id": str(m.id),
@@ -53,25 +53,20 @@ def generate_quiz_questions_hf_router(
     model: str | None = None,
     timeout_read_seconds: float | None = None,
 ) -> list[HfQuestion]:
+    # Runtime overrides, fetched in one round-trip (values are decoded str).
+    rt_enabled = None
+    rt_token = None
+    try:
+        rt_enabled, rt_token = get_redis().hmget("runtime:llm", ["hf_router_enabled", "hf_router_token"])
+    except Exception:
+        pass
+
     if not settings.hf_router_enabled:
         # Allow runtime enabling via Redis.
-        try:
-            r = get_redis()
-            enabled_raw = (r.hget("runtime:llm", "hf_router_enabled") or b"").decode("utf-8", errors="ignore")
-            if enabled_raw.strip().lower() not in {"1", "true", "yes", "on"}:
-                return []
-        except Exception:
+        if str(rt_enabled or "").strip().lower() not in {"1", "true", "yes", "on"}:
             return []
 
-    token = (settings.hf_router_token or "").strip()
-    # Runtime token override.
-    try:
-        r = get_redis()
-        rt = r.hget("runtime:llm", "hf_router_token")
-        if rt is not None:
-            token = (rt.decode("utf-8") if isinstance(rt, (bytes, bytearray)) else str(rt)).strip() or token
-    except Exception:
-        pass
+    token = str(rt_token or "").strip() or (settings.hf_router_token or "").strip()
     if not token:
         if debug_out is not None:
             debug_out["error"] = "missing_token"
@@ -9,25 +9,22 @@ from app.core.redis_client import get_redis
 
 
 def hf_router_healthcheck(*, base_url: str | None = None) -> tuple[bool, str | None]:
-    if not settings.hf_router_enabled:
-        # Allow runtime enabling via Redis.
-        try:
-            r = get_redis()
-            enabled_raw = (r.hget("runtime:llm", "hf_router_enabled") or b"").decode("utf-8", errors="ignore")
-            if enabled_raw.strip().lower() not in {"1", "true", "yes", "on"}:
-                return False, "disabled"
-        except Exception:
-            return False, "disabled"
-
-    token = (settings.hf_router_token or "").strip()
+    # One round-trip for both runtime overrides instead of two HGETs.
+    rt_enabled = None
+    rt_token = None
     try:
         r = get_redis()
-        rt = r.hget("runtime:llm", "hf_router_token")
-        if rt is not None:
-            token = (rt.decode("utf-8") if isinstance(rt, (bytes, bytearray)) else str(rt)).strip() or token
+        rt_enabled, rt_token = r.hmget("runtime:llm", ["hf_router_enabled", "hf_router_token"])
     except Exception:
         pass
 
+    if not settings.hf_router_enabled:
+        # Allow runtime enabling via Redis.
+        if str(rt_enabled or "").strip().lower() not in {"1", "true", "yes", "on"}:
+            return False, "disabled"
+
+    token = str(rt_token or "").strip() or (settings.hf_router_token or "").strip()
+
     if not token:
         return False, "missing_token"
 
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import uuid
+from collections import defaultdict
+from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
-from sqlalchemy import select, func, desc
+from sqlalchemy import select, func, desc, or_, union
 from sqlalchemy.orm import Session
 import json
 
@@ -11,6 +13,34 @@ from app.models.attempt import QuizAttempt
 from app.models.audit import LearningEvent, LearningEventType
 from app.models.user import User
 
+# Shared WHERE fragments, built once at import instead of per query.
+_IS_SUBMODULE_OPENED = LearningEvent.type == LearningEventType.submodule_opened
+_IS_LEGACY_READ = LearningEvent.meta == "read"
+# Cheap SQL prefilter for read confirmations (legacy 'read' or JSON {"action": "read"}):
+# drops plain open events in the DB so only candidates are shipped and parsed in Python.
+_MAY_BE_READ = func.lower(LearningEvent.meta).contains("read")
+_IS_PASSED = QuizAttempt.passed.is_(True)
+
+
+@dataclass(frozen=True, slots=True)
+class SubmoduleProgress:
+    """Per-lesson row of get_module_progress; FastAPI serializes it like a dict."""
+
+    submodule_id: str
+    quiz_id: str
+    requires_quiz: bool
+    title: str
+    order: int
+    read: bool
+    passed: bool
+    best_score: int | None
+    last_score: int | None
+    last_passed: bool | None
+    locked: bool
+    locked_reason: str | None
+    is_final: bool = False
+
+
 class LearningService:
     def __init__(self, db: Session):
         self.db = db
@@ -22,100 +52,107 @@ class LearningService:
         if not module_ids:
             return {}
 
-        modules = self.db.scalars(
-            select(Module).where(Module.id.in_(module_ids))
-        ).all()
-        
-        all_submodules = self.db.scalars(
-            select(Submodule).where(Submodule.module_id.in_(module_ids)).order_by(Submodule.module_id, Submodule.order)
-        ).all()
-        
-        submodules_by_module = {}
-        all_quiz_ids = []
-        all_sub_ids = []
-        for s in all_submodules:
-            submodules_by_module.setdefault(s.module_id, []).append(s)
-            if bool(getattr(s, "requires_quiz", True)):
-                all_quiz_ids.append(s.quiz_id)
-            all_sub_ids.append(s.id)
-        
-        for m in modules:
-            if m.final_quiz_id:
-                all_quiz_ids.append(m.final_quiz_id)
-
-        # Batch load best attempts
-        best_attempts = {}
-        if all_quiz_ids:
-            rows = self.db.execute(
-                select(QuizAttempt.quiz_id, func.max(QuizAttempt.score))
-                .where(
-                    QuizAttempt.user_id == user.id, 
-                    QuizAttempt.quiz_id.in_(all_quiz_ids), 
-                    QuizAttempt.passed == True
-                )
-                .group_by(QuizAttempt.quiz_id)
-            ).all()
-            best_attempts = {r[0]: r[1] for r in rows}
-
-        # Batch load read confirmations
-        read_ids = set()
-        if all_sub_ids:
-            read_ids = set(
-                self.db.scalars(
-                    select(LearningEvent.ref_id).where(
-                        LearningEvent.user_id == user.id,
-                        LearningEvent.type == LearningEventType.submodule_opened,
-                        LearningEvent.meta == "read",
-                        LearningEvent.ref_id.in_(all_sub_ids)
-                    )
-                ).all()
+        # One round-trip: the user's best passed attempts and read confirmations
+        # are CTEs left-joined onto every (module, submodule) pair, so Python only
+        # reshapes rows. Modules without submodules come back as a single row
+        # with NULL submodule columns. Both CTEs are limited to the requested
+        # modules' quizzes/lessons: best_cte is referenced twice, so PostgreSQL
+        # materializes it and must not aggregate the user's whole history.
+        module_quiz_ids = union(
+            select(Submodule.quiz_id).where(Submodule.module_id.in_(module_ids)),
+            select(Module.final_quiz_id).where(Module.id.in_(module_ids), Module.final_quiz_id.is_not(None)),
+        )
+        best_cte = (
+            select(QuizAttempt.quiz_id.label("quiz_id"), func.max(QuizAttempt.score).label("best_score"))
+            .where(QuizAttempt.user_id == user.id, _IS_PASSED, QuizAttempt.quiz_id.in_(module_quiz_ids))
+            .group_by(QuizAttempt.quiz_id)
+            .cte("best_attempts")
+        )
+        final_best = best_cte.alias("final_best_attempts")
+        read_cte = (
+            select(LearningEvent.ref_id.label("ref_id"))
+            .where(
+                LearningEvent.user_id == user.id,
+                _IS_SUBMODULE_OPENED,
+                _IS_LEGACY_READ,
+                LearningEvent.ref_id.in_(select(Submodule.id).where(Submodule.module_id.in_(module_ids))),
             )
+            .distinct()
+            .cte("read_confirmations")
+        )
 
-        results = {}
-        for m in modules:
-            submodules = submodules_by_module.get(m.id, [])
-            items = []
-            passed_count = 0
-            all_regular_passed = True
-            
-            for s in submodules:
-                requires_quiz = bool(getattr(s, "requires_quiz", True))
-                best_score = best_attempts.get(s.quiz_id) if requires_quiz else None
-                is_passed = best_score is not None if requires_quiz else False
-                items.append({
-                    "submodule_id": str(s.id),
-                    "passed": is_passed,
-                    "read": s.id in read_ids
-                })
-
-                if requires_quiz:
-                    if is_passed:
-                        passed_count += 1
-                    else:
-                        all_regular_passed = False
+        rows = self.db.execute(
+            select(
+                Module.id,
+                Module.final_quiz_id,
+                final_best.c.best_score,
+                Submodule.id,
+                Submodule.requires_quiz,
+                best_cte.c.best_score,
+                read_cte.c.ref_id,
+            )
+            .select_from(Module)
+            .outerjoin(Submodule, Submodule.module_id == Module.id)
+            .outerjoin(best_cte, best_cte.c.quiz_id == Submodule.quiz_id)
+            .outerjoin(read_cte, read_cte.c.ref_id == Submodule.id)
+            .outerjoin(final_best, final_best.c.quiz_id == Module.final_quiz_id)
+            .where(Module.id.in_(module_ids))
+            .order_by(Module.id, Submodule.order)
+        ).all()
+
+        acc: Dict[uuid.UUID, Dict[str, Any]] = {}
+        for module_id, final_quiz_id, final_best_score, sub_id, requires_quiz, best_score, read_ref in rows:
+            a = acc.get(module_id)
+            if a is None:
+                a = acc[module_id] = {
+                    "has_final": final_quiz_id is not None,
+                    "final_passed": final_quiz_id is not None and final_best_score is not None,
+                    "passed_count": 0,
+                    "all_regular_passed": True,
+                    "items": [],
+                }
+            if sub_id is None:
+                continue
+
+            requires_quiz = bool(requires_quiz)
+            is_passed = requires_quiz and best_score is not None
+            is_read = read_ref is not None
+            a["items"].append({
+                "submodule_id": str(sub_id),
+                "passed": is_passed,
+                "read": is_read
+            })
+
+            if requires_quiz:
+                if is_passed:
+                    a["passed_count"] += 1
                 else:
-                    # materials-only lesson: completion is read confirmation
-                    if s.id not in read_ids:
-                        all_regular_passed = False
-
-            final_best_score = best_attempts.get(m.final_quiz_id) if m.final_quiz_id else None
-            final_passed = final_best_score is not None
-            total_steps = len(submodules) + (1 if m.final_quiz_id else 0)
-            completed = all_regular_passed and (not m.final_quiz_id or final_passed)
-
-            results[m.id] = {
-                "total": total_steps,
-                "passed": passed_count + (1 if final_passed else 0),
-                "completed": completed,
+                    a["all_regular_passed"] = False
+            else:
+                # materials-only lesson: completion is read confirmation
+                if not is_read:
+                    a["all_regular_passed"] = False
+
+        results = {}
+        for module_id, a in acc.items():
+            items = a["items"]
+            final_passed = a["final_passed"]
+            results[module_id] = {
+                "total": len(items) + (1 if a["has_final"] else 0),
+                "passed": a["passed_count"] + (1 if final_passed else 0),
+                "completed": a["all_regular_passed"] and (not a["has_final"] or final_passed),
                 "submodules": items
             }
-        
+
         return results
 
-    def get_modules_analytics_batch(self, module_id: uuid.UUID) -> List[Dict[str, Any]]:
+    def get_modules_analytics_batch(self, module_id: uuid.UUID, *, include_inactive: bool = False) -> List[Dict[str, Any]]:
         """
         Batch analytics calculation for all users in a module.
         Eliminates N+1 query patterns.
+
+        By default only users with an attempt or an opened lesson in the module
+        are reported; pass include_inactive=True to list every user.
         """
         submodules = self.db.scalars(
             select(Submodule).where(Submodule.module_id == module_id).order_by(Submodule.order)
@@ -128,47 +165,67 @@ class LearningService:
         if m and m.final_quiz_id:
             quiz_ids.append(m.final_quiz_id)
 
-        users = self.db.scalars(select(User).order_by(User.name)).all()
-        user_ids = [u.id for u in users]
+        sub_ids = [s.id for s in submodules]
+
+        users_q = select(User).order_by(User.name)
+        if not include_inactive:
+            users_q = users_q.where(
+                or_(
+                    User.id.in_(select(QuizAttempt.user_id).where(QuizAttempt.quiz_id.in_(quiz_ids))),
+                    User.id.in_(
+                        select(LearningEvent.user_id).where(
+                            _IS_SUBMODULE_OPENED,
+                            LearningEvent.ref_id.in_(sub_ids),
+                        )
+                    ),
+                )
+            )
+        users = self.db.scalars(users_q).all()
+        if not users:
+            return []
 
-        # Batch load all passed attempts for all users/quizzes
+        # Batch load all passed attempts for the module's quizzes; rows of users
+        # outside the report are simply never looked up.
         passed_attempts_rows = self.db.execute(
             select(QuizAttempt.user_id, QuizAttempt.quiz_id)
             .where(
-                QuizAttempt.user_id.in_(user_ids),
                 QuizAttempt.quiz_id.in_(quiz_ids),
-                QuizAttempt.passed == True
+                _IS_PASSED
             )
-        ).all()
-        
-        passed_map = {} # (user_id, quiz_id) -> bool
+        )
+
+        passed_by_user: defaultdict[uuid.UUID, set[uuid.UUID]] = defaultdict(set)
         for uid, qid in passed_attempts_rows:
-            passed_map[(uid, qid)] = True
+            passed_by_user[uid].add(qid)
 
         # Batch load all read events
-        sub_ids = [s.id for s in submodules]
         read_events_rows = self.db.execute(
             select(LearningEvent.user_id, LearningEvent.ref_id)
+            .distinct()
             .where(
-                LearningEvent.user_id.in_(user_ids),
-                LearningEvent.type == LearningEventType.submodule_opened,
-                LearningEvent.meta == "read",
+                _IS_SUBMODULE_OPENED,
+                _IS_LEGACY_READ,
                 LearningEvent.ref_id.in_(sub_ids)
             )
-        ).all()
-        
-        read_map = {} # (user_id, submodule_id) -> bool
+        )
+
+        read_by_user: defaultdict[uuid.UUID, set[uuid.UUID]] = defaultdict(set)
         for uid, sid in read_events_rows:
-            read_map[(uid, sid)] = True
+            read_by_user[uid].add(sid)
+
+        lesson_quiz_ids = frozenset(s.quiz_id for s in submodules)
+        empty: frozenset[uuid.UUID] = frozenset()
 
         report = []
         for u in users:
-            read_count = sum(1 for s in submodules if (u.id, s.id) in read_map)
-            passed_quiz_count = sum(1 for s in submodules if (u.id, s.quiz_id) in passed_map)
+            # Read rows are DISTINCT and scoped to this module's submodules.
+            read_count = len(read_by_user.get(u.id, empty))
+            user_passed = passed_by_user.get(u.id, empty)
+            passed_quiz_count = len(lesson_quiz_ids.intersection(user_passed))
             
             final_passed = False
             if m and m.final_quiz_id:
-                final_passed = (u.id, m.final_quiz_id) in passed_map
+                final_passed = m.final_quiz_id in user_passed
 
             total_lessons = len(submodules)
             completed = (passed_quiz_count == total_lessons) and (not m or not m.final_quiz_id or final_passed)
@@ -218,52 +275,57 @@ class LearningService:
         if m.final_quiz_id:
             quiz_ids.append(m.final_quiz_id)
         
-        # Batch load quiz results
-        best_attempts = dict(
-            self.db.execute(
-                select(QuizAttempt.quiz_id, func.max(QuizAttempt.score))
-                .where(
-                    QuizAttempt.user_id == user.id, 
-                    QuizAttempt.quiz_id.in_(quiz_ids), 
-                    QuizAttempt.passed == True
-                )
-                .group_by(QuizAttempt.quiz_id)
-            ).all()
-        )
-
-        # Last attempt per quiz (for persistent UI display, even if not passed)
-        rn = func.row_number().over(
-            partition_by=QuizAttempt.quiz_id,
-            order_by=(desc(QuizAttempt.finished_at), desc(QuizAttempt.id)),
-        ).label("rn")
+        # Materials-only modules without a final quiz have nothing to look up;
+        # skip both attempt queries instead of sending an empty IN ().
+        best_attempts: dict[uuid.UUID, Any] = {}
+        last_attempt_map: dict[uuid.UUID, dict[str, Any]] = {}
+        if quiz_ids:
+            # Batch load quiz results
+            best_attempts = dict(
+                self.db.execute(
+                    select(QuizAttempt.quiz_id, func.max(QuizAttempt.score))
+                    .where(
+                        QuizAttempt.user_id == user.id, 
+                        QuizAttempt.quiz_id.in_(quiz_ids), 
+                        _IS_PASSED
+                    )
+                    .group_by(QuizAttempt.quiz_id)
+                ).all()
+            )
 
-        last_attempt_subq = (
-            select(
-                QuizAttempt.quiz_id.label("quiz_id"),
-                QuizAttempt.score.label("score"),
-                QuizAttempt.passed.label("passed"),
-                QuizAttempt.finished_at.label("finished_at"),
-                rn,
+            # Last attempt per quiz (for persistent UI display, even if not passed)
+            rn = func.row_number().over(
+                partition_by=QuizAttempt.quiz_id,
+                order_by=(desc(QuizAttempt.finished_at), desc(QuizAttempt.id)),
+            ).label("rn")
+
+            last_attempt_subq = (
+                select(
+                    QuizAttempt.quiz_id.label("quiz_id"),
+                    QuizAttempt.score.label("score"),
+                    QuizAttempt.passed.label("passed"),
+                    QuizAttempt.finished_at.label("finished_at"),
+                    rn,
+                )
+                .where(QuizAttempt.user_id == user.id, QuizAttempt.quiz_id.in_(quiz_ids))
+                .subquery()
             )
-            .where(QuizAttempt.user_id == user.id, QuizAttempt.quiz_id.in_(quiz_ids))
-            .subquery()
-        )
 
-        last_attempt_rows = self.db.execute(
-            select(
-                last_attempt_subq.c.quiz_id,
-                last_attempt_subq.c.score,
-                last_attempt_subq.c.passed,
-            ).where(last_attempt_subq.c.rn == 1)
-        ).all()
+            last_attempt_rows = self.db.execute(
+                select(
+                    last_attempt_subq.c.quiz_id,
+                    last_attempt_subq.c.score,
+                    last_attempt_subq.c.passed,
+                ).where(last_attempt_subq.c.rn == 1)
+            ).all()
 
-        last_attempt_map: dict[uuid.UUID, dict[str, Any]] = {
-            quiz_id: {
-                "score": int(score) if score is not None else None,
-                "passed": bool(passed) if passed is not None else None,
+            last_attempt_map = {
+                quiz_id: {
+                    "score": int(score) if score is not None else None,
+                    "passed": bool(passed) if passed is not None else None,
+                }
+                for quiz_id, score, passed in last_attempt_rows
             }
-            for quiz_id, score, passed in last_attempt_rows
-        }
 
         def _meta_action_is_read(meta: str | None) -> bool:
             if not meta:
@@ -281,61 +343,57 @@ class LearningService:
         # Батч-загрузка подтверждений прочтения.
         # Important: meta can be legacy 'read' OR JSON like {"action":"read"}.
         sub_ids = [s.id for s in submodules]
+        # DISTINCT lets the DB collapse repeated opens; rows are streamed
+        # straight into the set instead of materializing a list first.
         read_rows = self.db.execute(
-            select(LearningEvent.ref_id, LearningEvent.meta).where(
+            select(LearningEvent.ref_id, LearningEvent.meta)
+            .where(
                 LearningEvent.user_id == user.id,
-                LearningEvent.type == LearningEventType.submodule_opened,
-                LearningEvent.meta.is_not(None),
+                _IS_SUBMODULE_OPENED,
+                _MAY_BE_READ,
                 LearningEvent.ref_id.in_(sub_ids),
             )
-        ).all()
-        read_ids = {ref_id for (ref_id, meta) in (read_rows or []) if _meta_action_is_read(meta)}
+            .distinct()
+            .execution_options(yield_per=1000)
+        )
+        read_ids = {ref_id for (ref_id, meta) in read_rows if _meta_action_is_read(meta)}
+
+        # Completion per lesson: quiz lessons need a passed attempt,
+        # materials-only lessons need a read confirmation.
+        requires = [bool(getattr(s, "requires_quiz", True)) for s in submodules]
+        done_flags = [
+            (best_attempts.get(s.quiz_id) is not None) if rq else (s.id in read_ids)
+            for s, rq in zip(submodules, requires)
+        ]
+        passed_count = sum(done_flags)
+        # Логика блокировки: последовательное прохождение — every lesson after
+        # the first incomplete one is locked.
+        first_incomplete = next((i for i, done in enumerate(done_flags) if not done), len(done_flags))
+        all_regular_passed = first_incomplete == len(done_flags)
 
         items = []
-        passed_count = 0
-        all_regular_passed = True
-        
-        for s in submodules:
-            requires_quiz = bool(getattr(s, "requires_quiz", True))
+        for i, (s, requires_quiz) in enumerate(zip(submodules, requires)):
             best_score = best_attempts.get(s.quiz_id) if requires_quiz else None
             is_passed = best_score is not None if requires_quiz else False
             is_read = s.id in read_ids
 
             last = last_attempt_map.get(s.quiz_id) or {}
-            last_score = last.get("score")
-            last_passed = last.get("passed")
-            
-            # Логика блокировки: последовательное прохождение
-            locked = bool(not all_regular_passed and items)
-            locked_reason = "complete_previous_lesson" if locked else None
-
-            items.append({
-                "submodule_id": str(s.id),
-                "quiz_id": str(s.quiz_id),
-                "requires_quiz": bool(requires_quiz),
-                "title": s.title,
-                "order": s.order,
-                "read": bool(is_read),
-                "passed": is_passed,
-                "best_score": int(best_score) if best_score is not None else None,
-                "last_score": last_score,
-                "last_passed": last_passed,
-                "locked": locked,
-                "locked_reason": locked_reason,
-                "is_final": False
-            })
-
-            if requires_quiz:
-                if is_passed:
-                    passed_count += 1
-                else:
-                    all_regular_passed = False
-            else:
-                # materials-only lesson: completion is read confirmation
-                if is_read:
-                    passed_count += 1
-                else:
-                    all_regular_passed = False
+            locked = i > first_incomplete
+
+            items.append(SubmoduleProgress(
+                submodule_id=str(s.id),
+                quiz_id=str(s.quiz_id),
+                requires_quiz=bool(requires_quiz),
+                title=s.title,
+                order=s.order,
+                read=bool(is_read),
+                passed=is_passed,
+                best_score=int(best_score) if best_score is not None else None,
+                last_score=last.get("score"),
+                last_passed=last.get("passed"),
+                locked=locked,
+                locked_reason="complete_previous_lesson" if locked else None,
+            ))
 
         total_steps = len(submodules) + (1 if m.final_quiz_id else 0)
         final_quiz_id_str = str(m.final_quiz_id) if m.final_quiz_id else None
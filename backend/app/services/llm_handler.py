@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import random
 import time
 import re
-from typing import Any
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator
 
 from app.core.config import settings
 from app.core.redis_client import get_redis
@@ -12,190 +16,595 @@ from app.services.hf_router_health import hf_router_healthcheck
 from app.services.openrouter import generate_quiz_questions_openrouter
 from app.services.openrouter_health import openrouter_healthcheck
 
+_TRUTHY = frozenset({"1", "true", "yes", "on"})
+
+_ABCD = frozenset("ABCD")
+_QUESTION_TYPES = frozenset({"single", "multi", "case"})
+# Provider errors where the raw output is worth a strict-JSON repair call.
+_REPAIRABLE_ERRORS = frozenset({"invalid_json", "schema_validation_failed", "no_valid_questions"})
+
+_WS_RE = re.compile(r"\s+")
+# Accept common option formats: A) / A. / A: and A - / A —
+_OPTION_HEADS = frozenset("ABCDabcd")
+_ABCD_RE = re.compile(r"^([ABCD])\s*[).:]\s*(.+)$", re.IGNORECASE)
+_ABCD_DASH_RE = re.compile(r"^([ABCD])\s+[-—]\s*(.+)$", re.IGNORECASE)
+
+# Background healthchecks overlapping the first provider call.
+_HC_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm_healthcheck")
+# Hedged provider calls (see _first_acceptable).
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm_hedge")
+
+# System prompt for OpenRouter generation and JSON repair calls.
+_STRICT_PROMPT_RU = (
+    "Ты методист и экзаменатор. Верни ТОЛЬКО валидный JSON без Markdown и без текста вокруг. "
+    "Язык: русский. Структура строго: {\"questions\":[{"
+    "\"type\":\"single\",\"prompt\":\"...\\nA) ...\\nB) ...\\nC) ...\\nD) ...\","
+    "\"correct_answer\":\"A\",\"explanation\":\"...\"}]}. "
+    "В prompt обязательно 4 варианта A) B) C) D) (каждый с новой строки). "
+    "correct_answer: строго одна буква A|B|C|D. "
+    "НЕ допускай, чтобы correct_answer всегда был один и тот же. Разноси ответы по буквам. "
+    "Вопросы должны проверять смысл, а не формальность. explanation: 1-2 предложения с опорой на текст. "
+    "Никаких ссылок на внешние знания: только по данному тексту."
+)
+
+
+def _as_bool(raw: str | None) -> bool:
+    return (raw or "").strip().lower() in _TRUTHY
+
+
+# Fields of runtime:llm consumed by generate_quiz_questions_ai. The hash also
+# carries tokens and other admin settings we never read here.
+_RUNTIME_KEYS = (
+    "ollama_enabled",
+    "ollama_base_url",
+    "ollama_model",
+    "hf_router_enabled",
+    "hf_router_base_url",
+    "hf_router_model",
+    "openrouter_enabled",
+    "openrouter_base_url",
+    "openrouter_model",
+)
+
+# Last OpenRouter healthcheck result ("ok" / "fail"), shared by all workers.
+_HC_OPENROUTER_KEY = "hc:openrouter"
+_HC_TTL_SECONDS = 30
+
+# Runtime overrides change only when an admin saves the diagnostics tab, so a
+# few seconds of staleness is fine and saves a Redis round-trip per call.
+_RT_TTL_SECONDS = 5.0
+_rt_cache: tuple[float, dict[str, str], str | None] | None = None
+
+
+def _load_llm_runtime() -> tuple[dict[str, str], str | None]:
+    """Runtime overrides (admin diagnostics tab) and the cached OpenRouter health.
+
+    Both come from Redis in a single pipelined round-trip.
+    """
+    global _rt_cache
+    cached = _rt_cache
+    if cached is not None and time.monotonic() - cached[0] < _RT_TTL_SECONDS:
+        return cached[1], cached[2]
 
-def generate_quiz_questions_ai(
-    *,
-    title: str,
-    text: str,
-    n_questions: int = 3,
-    min_questions: int | None = None,
-    retries: int = 1,
-    backoff_seconds: float = 0.8,
-    debug_out: dict[str, Any] | None = None,
-    provider_order: list[str] | None = None,
-    time_budget_seconds: float | None = None,
-) -> list[Any]:
-    """Unified LLM handler with fallback.
+    try:
+        # get_redis() decodes responses, so values are already str.
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hmget("runtime:llm", _RUNTIME_KEYS)
+        pipe.get(_HC_OPENROUTER_KEY)
+        vals, or_health = pipe.execute()
+        runtime = {k: v for k, v in zip(_RUNTIME_KEYS, vals or ()) if v is not None}
+    except Exception:
+        # Do not cache failures: retry Redis on the next call.
+        return {}, None
+    _rt_cache = (time.monotonic(), runtime, or_health)
+    return runtime, or_health
 
-    Returns questions with fields: type, prompt, correct_answer, explanation.
-    """
 
-    def _clean(s: object) -> str:
-        return re.sub(r"\s+", " ", str(s or "").strip()).strip()
+def _openrouter_healthcheck_shared() -> tuple[bool, str | None]:
+    """openrouter_healthcheck() that publishes its result for other workers."""
+    ok, reason = openrouter_healthcheck()
+    try:
+        get_redis().setex(_HC_OPENROUTER_KEY, _HC_TTL_SECONDS, "ok" if ok else "fail")
+    except Exception:
+        pass
+    return ok, reason
 
-    def _extract_abcd_options(prompt: str) -> list[str] | None:
-        if not prompt:
-            return None
-        lines = [ln.strip() for ln in str(prompt).splitlines() if ln.strip()]
-        opts: dict[str, str] = {}
-        for ln in lines:
-            if len(ln) < 3:
-                continue
-            # Accept common option formats: A) / A. / A - / A:
-            head2 = ln[:2].upper()
-            head3 = ln[:3].upper() if len(ln) >= 3 else head2
-            key = ""
-            if head2 in {"A)", "B)", "C)", "D)"}:
-                key = head2[0]
-                val = ln[2:].strip()
-            elif head2 and head2[0] in {"A", "B", "C", "D"} and head2[1] in {".", ":"}:
-                key = head2[0]
-                val = ln[2:].strip()
-            elif head3 and head3[0] in {"A", "B", "C", "D"} and head3[1] == " " and head3[2] in {"-", "—"}:
-                key = head3[0]
-                val = ln[3:].strip()
-            else:
-                continue
-            try:
-                if key and val:
-                    opts[key] = val
-            except Exception:
-                continue
-        if all(k in opts for k in ("A", "B", "C", "D")):
-            return [opts["A"], opts["B"], opts["C"], opts["D"]]
-        return None
 
-    def _norm_correct_answer(raw: str) -> str:
-        s = _clean(raw).upper()
-        if not s:
-            return ""
-        # Allow "A" / "A)" / "A." / "A," etc.
-        ch = s[:1]
-        return ch if ch in {"A", "B", "C", "D"} else ""
-
-    def _is_valid_question(q: Any, *, seen_prompts: set[str]) -> bool:
-        raw_type = _clean(getattr(q, "type", "") or "single").lower()
-        if raw_type not in {"single", "multi", "case"}:
-            return False
+def _acquire_rate_slot(provider: str, *, max_rps: int, max_wait_s: float) -> bool:
+    """Wait for a slot in the shared per-second call window of `provider`.
 
-        prompt = str(getattr(q, "prompt", "") or "").strip()
-        if len(_clean(prompt)) < 18:
+    The window is a Redis counter (INCR + EXPIRE, as in app.core.rate_limit), so
+    every API/worker process draws from the same allowance. Returns False when no
+    slot frees up within `max_wait_s`. Redis errors fail open.
+    """
+    if max_rps <= 0:
+        return True
+    deadline = time.monotonic() + max(0.0, float(max_wait_s))
+    r = get_redis()
+    while True:
+        now = time.time()
+        key = f"rl:llm:{provider}:{int(now)}"
+        try:
+            current = r.incr(key)
+            if current == 1:
+                r.expire(key, 2)
+        except Exception:
+            return True
+        if int(current) <= max_rps:
+            return True
+        # Window is full: sleep until the next second starts.
+        wait_s = 1.0 - (now - int(now))
+        if time.monotonic() + wait_s > deadline:
             return False
+        time.sleep(wait_s)
 
-        norm_p = _clean(prompt).lower()
-        if norm_p in seen_prompts:
-            return False
 
-        opts = _extract_abcd_options(prompt)
-        if not opts:
-            return False
+def _clean(s: object) -> str:
+    return _WS_RE.sub(" ", str(s or "")).strip()
+
 
-        norm_opts = [_clean(o).lower() for o in opts]
-        if len({o for o in norm_opts if o}) != 4:
+def _extract_abcd_options(prompt: str) -> list[str] | None:
+    # `prompt` is already a stripped str; only the lines need stripping.
+    if not prompt:
+        return None
+    opts: dict[str, str] = {}
+    for ln in prompt.splitlines():
+        ln = ln.strip()
+        # Cheap first-character gate: stem lines never reach the regexes.
+        if len(ln) < 3 or ln[0] not in _OPTION_HEADS:
+            continue
+        m = _ABCD_RE.match(ln) or _ABCD_DASH_RE.match(ln)
+        if m is None:
+            continue
+        val = m.group(2).strip()
+        if val:
+            opts[m.group(1).upper()] = val
+            # Options usually sit together right after the stem; stop at the
+            # fourth instead of scanning the rest of the prompt.
+            if len(opts) == 4:
+                return [opts["A"], opts["B"], opts["C"], opts["D"]]
+    return None
+
+
+def _norm_correct_answer(cleaned: str) -> str:
+    # Expects a _clean()-ed value. Allow "A" / "A)" / "A." / "A," etc.
+    ch = cleaned[:1].upper()
+    return ch if ch in _ABCD else ""
+
+
+def _is_valid_question(q: Any, *, seen_prompts: set[str], letters: set[str]) -> bool:
+    raw_type = _clean(getattr(q, "type", "") or "single").lower()
+    if raw_type not in _QUESTION_TYPES:
+        return False
+
+    # Normalize the prompt once: the same value serves the length check
+    # and the dedup key.
+    prompt = str(getattr(q, "prompt", "") or "").strip()
+    norm_p = _clean(prompt).lower()
+    if len(norm_p) < 18:
+        return False
+    if norm_p in seen_prompts:
+        return False
+
+    opts = _extract_abcd_options(prompt)
+    if not opts:
+        return False
+
+    norm_opts = [_clean(o).lower() for o in opts]
+    if len({o for o in norm_opts if o}) != 4:
+        return False
+    if any(len(o) < 2 for o in norm_opts):
+        return False
+
+    ca_raw = _clean(getattr(q, "correct_answer", ""))
+    if raw_type == "multi":
+        # Format: A,C (letters, comma-separated, no spaces)
+        parts = [p.strip().upper() for p in ca_raw.split(",") if p.strip()]
+        if len(parts) < 2:
             return False
-        if any(len(o) < 2 for o in norm_opts):
+        if any(p not in _ABCD for p in parts):
             return False
-
-        ca_raw = _clean(getattr(q, "correct_answer", ""))
-        if raw_type == "multi":
-            # Format: A,C (letters, comma-separated, no spaces)
-            parts = [p.strip().upper() for p in ca_raw.split(",") if p.strip()]
-            if len(parts) < 2:
-                return False
-            if any(p not in {"A", "B", "C", "D"} for p in parts):
-                return False
-        else:
-            if _norm_correct_answer(ca_raw) not in {"A", "B", "C", "D"}:
-                return False
-
-        exp = _clean(getattr(q, "explanation", ""))
-        if len(exp) < 6:
+    else:
+        if _norm_correct_answer(ca_raw) not in _ABCD:
             return False
 
-        seen_prompts.add(norm_p)
-        return True
+    exp = _clean(getattr(q, "explanation", ""))
+    if len(exp) < 6:
+        return False
 
-    def _filter_questions(items: list[Any], *, want: int) -> list[Any]:
-        seen: set[str] = set()
-        out: list[Any] = []
-        for q in items or []:
-            if _is_valid_question(q, seen_prompts=seen):
-                out.append(q)
-            if len(out) >= want:
-                break
-        return out
+    seen_prompts.add(norm_p)
+    letters.add(ca_raw[:1].upper())
+    return True
+
+
+def _iter_valid_questions(items: Iterable[Any], *, letters: set[str]) -> Iterator[Any]:
+    """Lazily yield valid, deduplicated questions, recording answer letters.
+
+    Consumers stop pulling once they have enough, so the tail of a long
+    candidate list is never validated.
+    """
+    seen: set[str] = set()
+    for q in items:
+        if _is_valid_question(q, seen_prompts=seen, letters=letters):
+            yield q
+
+
+def _filter_questions(items: list[Any], *, want: int) -> tuple[list[Any], set[str]]:
+    """Valid questions (up to `want`) and the first letters of their answers."""
+    letters: set[str] = set()
+    if want <= 0:
+        return [], letters
+    return list(islice(_iter_valid_questions(items or [], letters=letters), want)), letters
 
-    def _is_degenerate(items: list[Any]) -> bool:
-        # Reject common failure mode where model returns correct_answer always 'A' or always same.
-        if not items or len(items) < 3:
-            return False
-        answers: list[str] = []
-        for q in items:
-            ca = _clean(getattr(q, "correct_answer", ""))
-            if not ca:
-                continue
-            answers.append(ca[:1].upper())
-        if len(answers) < 3:
-            return False
-        return len(set(answers)) <= 1
 
-    def _set_debug(key: str, value: object) -> None:
-        if debug_out is None:
-            return
-        debug_out[key] = value
+def _is_degenerate(items: list[Any], letters: set[str]) -> bool:
+    # Reject common failure mode where model returns correct_answer always 'A' or always same.
+    return len(items) >= 3 and len(letters) <= 1
 
-    # Runtime overrides (admin diagnostics tab) stored in Redis.
-    runtime: dict[str, str] = {}
+
+def _healthcheck_ok(future: Future) -> bool:
     try:
-        r = get_redis()
-        raw = r.hgetall("runtime:llm") or {}
-        for k, v in (raw or {}).items():
-            kk = k.decode("utf-8") if isinstance(k, (bytes, bytearray)) else str(k)
-            vv = v.decode("utf-8") if isinstance(v, (bytes, bytearray)) else str(v)
-            runtime[kk] = vv
+        ok, _meta = future.result()
+        return bool(ok)
     except Exception:
-        runtime = {}
+        return False
+
+
+def _first_acceptable(calls: list[Callable[[], Any]], *, want: int, min_q: int) -> tuple[int, list[Any]]:
+    """Run provider calls concurrently and return the first acceptable result.
+
+    Returns (index of the winning call, its valid questions), or (-1, []) when no
+    call yields at least `min_q` non-degenerate questions. Calls that are still
+    running cannot be interrupted; their results are discarded.
+    """
+    futures = {_HEDGE_POOL.submit(fn): i for i, fn in enumerate(calls)}
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            try:
+                out = f.result()
+            except Exception:
+                continue
+            valid, letters = _filter_questions(list(out or []), want=want)
+            if valid and len(valid) >= min_q and not _is_degenerate(valid, letters):
+                for other in pending:
+                    other.cancel()
+                return futures[f], valid
+    return -1, []
+
+
+def _backoff(attempt: int, base: float) -> float:
+    # Full-jitter exponential backoff, capped so a retry never eats the budget.
+    return random.uniform(0.0, min(float(base) * (2 ** (attempt - 1)), 5.0))
+
+
+def _set_debug(debug_out: dict[str, Any] | None, key: str, value: object) -> None:
+    if debug_out is None:
+        return
+    debug_out[key] = value
+
+
+def _cap_tries_by_budget(*, rem_s: float | None, per_attempt_s: float, max_tries_in: int) -> int:
+    if rem_s is None:
+        return max_tries_in
+    # Reserve small overhead per attempt (json parsing, retries, etc.)
+    cost = max(1.0, float(per_attempt_s) + 1.0)
+    return max(1, min(int(max_tries_in), int(rem_s // cost) + 1))
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderSpec:
+    """One provider as driven by _try_provider.
+
+    `call(debug_out, read_timeout_s)` makes a generation attempt. `repair(raw,
+    debug_out, read_timeout_s)` asks the provider to fix its own near-JSON
+    output; `hedge_repair` races that repair with a fresh attempt. `acquire`
+    gates every call on a rate limit and `healthcheck` runs next to the first
+    attempt to decide whether retrying is worthwhile.
+    """
+
+    name: str
+    enabled: bool
+    per_attempt_s: float
+    min_read_s: float
+    call: Callable[[dict[str, Any], float | None], list[Any]]
+    # Skip the provider when less budget than this is left.
+    min_budget_s: float | None = None
+    repair: Callable[[str, dict[str, Any], float | None], list[Any]] | None = None
+    hedge_repair: bool = False
+    acquire: Callable[[float], bool] | None = None
+    healthcheck: Callable[[], tuple[bool, Any]] | None = None
+
 
-    runtime_order = (runtime.get("llm_provider_order") or "").strip()
-    runtime_ollama_enabled_raw = (runtime.get("ollama_enabled") or "").strip().lower()
-    runtime_ollama_enabled = runtime_ollama_enabled_raw in {"1", "true", "yes", "on"} if runtime_ollama_enabled_raw else None
+_PROVIDER_ALIASES = {"or": "openrouter", "hf": "hf_router"}
+
+
+def _slot_and_read_s(spec: ProviderSpec, remaining: Callable[[], float | None]) -> tuple[str | None, float | None]:
+    """Wait for a rate slot within the budget, then size the read timeout from what is left.
+
+    Returns (error, read_s); `error` is "budget_exhausted" or "rate_limited" when
+    no call should be made. The slot wait is capped at the remaining budget and
+    `read_s` is computed after it, so waiting never extends an attempt past the budget.
+    """
+    rem = remaining()
+    if rem is not None and rem <= 0.0:
+        return "budget_exhausted", None
+    if spec.acquire is not None:
+        # Queue behind other workers instead of collecting a 429.
+        if not spec.acquire(spec.per_attempt_s if rem is None else min(spec.per_attempt_s, rem)):
+            return "rate_limited", None
+        rem = remaining()
+        if rem is not None and rem <= 0.0:
+            return "budget_exhausted", None
+    read_s = max(spec.min_read_s, min(spec.per_attempt_s, rem - 1.0)) if rem is not None else None
+    return None, read_s
+
+
+def _repair_attempt(
+    spec: ProviderSpec,
+    *,
+    local_debug: dict[str, Any],
+    remaining: Callable[[], float | None],
+    want: int,
+    min_q: int,
+) -> list[Any]:
+    """Repair step: feed near-JSON that failed parsing/validation back to the provider.
+
+    With `hedge_repair`, a degenerate answer set (all-same correct letters) is also
+    handled here: the repair races a fresh attempt instead of waiting for the
+    backoff-then-retry path.
+    """
+    raw = str(local_debug.get("raw") or "").strip()
+    err = str(local_debug.get("error") or "")
+    hedge_degenerate = spec.hedge_repair and err == "degenerate_answers"
+    if not raw or len(raw) < 20 or (err not in _REPAIRABLE_ERRORS and not hedge_degenerate):
+        return []
+    repair_debug: dict[str, Any] = {}
+
+    def _repair_call() -> list[Any]:
+        err, read_s = _slot_and_read_s(spec, remaining)
+        if err is not None:
+            repair_debug["error"] = err
+            return []
+        return spec.repair(raw, repair_debug, read_s)
+
+    if spec.hedge_repair:
+        # Hedge: a fresh attempt races the repair call and the first acceptable
+        # answer wins.
+        def _retry_call() -> list[Any]:
+            err, read_s = _slot_and_read_s(spec, remaining)
+            if err is not None:
+                return []
+            return spec.call({}, read_s)
+
+        winner, hedged_valid = _first_acceptable([_repair_call, _retry_call], want=want, min_q=min_q)
+        if winner < 0:
+            return []
+        local_debug["hedge_winner"] = "repair" if winner == 0 else "retry"
+        local_debug["repair_used"] = winner == 0
+        return hedged_valid
+
+    repaired = _repair_call()
+    repaired_valid, repaired_letters = _filter_questions(list(repaired or []), want=want)
+    if not repaired_valid or _is_degenerate(repaired_valid, repaired_letters):
+        return []
+    local_debug["repair_used"] = True
+    local_debug["repair_error"] = str(repair_debug.get("error") or "")
+    return repaired_valid
+
+
+def _try_provider(
+    spec: ProviderSpec,
+    *,
+    want: int,
+    min_q: int,
+    max_tries: int,
+    backoff: float,
+    remaining: Callable[[], float | None],
+    debug_out: dict[str, Any] | None,
+) -> tuple[list[Any], str | None]:
+    """Budget-capped retry loop for one provider.
+
+    Returns (questions, None) on success, ([], None) when the provider is
+    disabled and ([], error) when it was skipped or every attempt failed.
+    """
+    rem = remaining()
+    if spec.min_budget_s is not None and rem is not None and rem < max(spec.min_budget_s, spec.per_attempt_s * 0.75):
+        return [], "skipped_budget"
+    if not spec.enabled:
+        return [], None
+
+    # The healthcheck only decides whether a failed attempt is worth retrying,
+    # so run it alongside the first generation call instead of in front of it.
+    hc_future = _HC_POOL.submit(spec.healthcheck) if spec.healthcheck is not None else None
+
+    # At most `want` questions are kept, so fewer than three can never be degenerate.
+    check_degenerate = want >= 3
+    last_err = None
+    # Each attempt may take up to its read timeout. Cap attempts so we stay
+    # within the overall budget.
+    cap_tries = _cap_tries_by_budget(rem_s=remaining(), per_attempt_s=spec.per_attempt_s, max_tries_in=max_tries)
+    for attempt in range(1, cap_tries + 1):
+        err, read_s = _slot_and_read_s(spec, remaining)
+        if err is not None:
+            last_err = err
+            break
+        local_debug: dict[str, Any] = {}
+
+        out = spec.call(local_debug, read_s)
+        valid, letters = _filter_questions(list(out or []), want=want)
+        if check_degenerate and valid and _is_degenerate(valid, letters):
+            valid = []
+            local_debug["error"] = "degenerate_answers"
+
+        if not valid and spec.repair is not None and attempt < cap_tries:
+            valid = _repair_attempt(spec, local_debug=local_debug, remaining=remaining, want=want, min_q=min_q)
+
+        if valid and len(valid) >= min_q:
+            _set_debug(debug_out, "provider", spec.name)
+            _set_debug(debug_out, "provider_error", None)
+            if debug_out is not None:
+                debug_out.setdefault(f"{spec.name}_attempts", attempt)
+                if "hedge_winner" in local_debug:
+                    debug_out["hedge_winner"] = local_debug["hedge_winner"]
+            return valid, None
+
+        last_err = str(local_debug.get("error") or "empty")
+        if hc_future is not None and not _healthcheck_ok(hc_future):
+            break
+        if attempt < cap_tries:
+            time.sleep(_backoff(attempt, backoff))
+
+    return [], str(last_err or "empty")
+
+
+def generate_quiz_questions_ai(
+    *,
+    title: str,
+    text: str,
+    n_questions: int = 3,
+    min_questions: int | None = None,
+    retries: int = 1,
+    backoff_seconds: float = 0.8,
+    debug_out: dict[str, Any] | None = None,
+    provider_order: list[str] | None = None,
+    time_budget_seconds: float | None = None,
+) -> list[Any]:
+    """Unified LLM handler with fallback.
+
+    Returns questions with fields: type, prompt, correct_answer, explanation.
+    """
+
+    runtime, or_health = _load_llm_runtime()
+
+    runtime_ollama_enabled_raw = (runtime.get("ollama_enabled") or "").strip()
+    runtime_ollama_enabled = _as_bool(runtime_ollama_enabled_raw) if runtime_ollama_enabled_raw else None
     runtime_ollama_base_url = (runtime.get("ollama_base_url") or "").strip() or None
     runtime_ollama_model = (runtime.get("ollama_model") or "").strip() or None
 
-    runtime_hf_enabled = (runtime.get("hf_router_enabled") or "").strip().lower() in {"1", "true", "yes", "on"}
+    runtime_hf_enabled = _as_bool(runtime.get("hf_router_enabled"))
     runtime_hf_base_url = (runtime.get("hf_router_base_url") or "").strip() or None
     runtime_hf_model = (runtime.get("hf_router_model") or "").strip() or None
 
-    runtime_or_enabled = (runtime.get("openrouter_enabled") or "").strip().lower() in {"1", "true", "yes", "on"}
+    runtime_or_enabled = _as_bool(runtime.get("openrouter_enabled"))
     runtime_or_base_url = (runtime.get("openrouter_base_url") or "").strip() or None
     runtime_or_model = (runtime.get("openrouter_model") or "").strip() or None
 
+    or_max_rps = int(getattr(settings, "openrouter_max_rps", 0) or 0)
+    or_connect_timeout = float(getattr(settings, "openrouter_timeout_connect", 3.0) or 3.0)
+    # Enough room for n questions plus JSON framing; an uncapped reply only
+    # adds latency and risks truncation mid-JSON (which costs a repair call).
+    or_max_tokens = 200 + 120 * max(1, int(n_questions or 0))
+    ollama_enabled = bool(settings.ollama_enabled) if runtime_ollama_enabled is None else bool(runtime_ollama_enabled)
+    try:
+        ollama_read_timeout = float(getattr(settings, "ollama_timeout_read", 35.0) or 35.0)
+    except Exception:
+        ollama_read_timeout = 35.0
+
+    def _or_call(
+        debug: dict[str, Any],
+        read_s: float | None,
+        *,
+        temperature: float = 0.2,
+        repair_text: str | None = None,
+    ) -> list[Any]:
+        return generate_quiz_questions_openrouter(
+            title=title,
+            text=text,
+            n_questions=n_questions,
+            debug_out=debug,
+            base_url=runtime_or_base_url,
+            model=runtime_or_model,
+            system_prompt=_STRICT_PROMPT_RU,
+            temperature=temperature,
+            timeout_read_seconds=read_s,
+            timeout_connect_seconds=min(or_connect_timeout, read_s) if read_s is not None else or_connect_timeout,
+            max_output_tokens=or_max_tokens,
+            repair_text=repair_text,
+        )
+
+    def _or_repair(raw: str, debug: dict[str, Any], read_s: float | None) -> list[Any]:
+        return _or_call(debug, read_s, temperature=0.0, repair_text=raw)
+
+    def _ollama_call(debug: dict[str, Any], read_s: float | None) -> list[Any]:
+        return generate_quiz_questions_ollama(
+            title=title,
+            text=text,
+            n_questions=n_questions,
+            debug_out=debug,
+            enabled=ollama_enabled,
+            base_url=runtime_ollama_base_url,
+            model=runtime_ollama_model,
+            timeout_read_seconds=read_s,
+        )
+
+    def _hf_call(debug: dict[str, Any], read_s: float | None) -> list[Any]:
+        return generate_quiz_questions_hf_router(
+            title=title,
+            text=text,
+            n_questions=n_questions,
+            debug_out=debug,
+            base_url=runtime_hf_base_url,
+            model=runtime_hf_model,
+            timeout_read_seconds=read_s,
+        )
+
+    # Effective provider settings, resolved once so the retry loop only reads
+    # the specs instead of settings/runtime on every attempt.
+    providers = {
+        "openrouter": ProviderSpec(
+            name="openrouter",
+            enabled=bool(settings.openrouter_enabled) or bool(runtime_or_enabled),
+            per_attempt_s=float(getattr(settings, "openrouter_timeout_read", 15.0) or 15.0),
+            min_read_s=3.0,
+            call=_or_call,
+            repair=_or_repair,
+            hedge_repair=bool(getattr(settings, "openrouter_hedge_enabled", False)),
+            acquire=lambda wait_s: _acquire_rate_slot("openrouter", max_rps=or_max_rps, max_wait_s=wait_s),
+            # A recent passing healthcheck from any worker makes another one redundant.
+            healthcheck=None if or_health == "ok" else _openrouter_healthcheck_shared,
+        ),
+        # Ollama can block up to its internal timeouts.
+        "ollama": ProviderSpec(
+            name="ollama",
+            enabled=ollama_enabled,
+            per_attempt_s=ollama_read_timeout,
+            min_read_s=4.0,
+            call=_ollama_call,
+            min_budget_s=6.0,
+        ),
+        "hf_router": ProviderSpec(
+            name="hf_router",
+            enabled=bool(settings.hf_router_enabled) or bool(runtime_hf_enabled),
+            per_attempt_s=float(getattr(settings, "hf_router_timeout_read", 12.0) or 12.0),
+            min_read_s=3.0,
+            call=_hf_call,
+            min_budget_s=4.0,
+        ),
+    }
+
     # Product configuration: OpenRouter-only.
     # Ignore other providers even if configured.
     order = ["openrouter"]
 
     errors: list[str] = []
 
-    t_start = time.monotonic()
+    # Budget clock in integer nanoseconds; converted to seconds only for callers.
+    t_start_ns = time.monotonic_ns()
     budget_s = float(time_budget_seconds) if time_budget_seconds is not None else None
+    budget_ns = int(budget_s * 1_000_000_000) if budget_s is not None else None
     if debug_out is not None:
         debug_out.setdefault("time_budget_seconds", budget_s)
 
     def _remaining_s() -> float | None:
-        if budget_s is None:
+        if budget_ns is None:
             return None
-        return max(0.0, budget_s - (time.monotonic() - t_start))
+        rem_ns = budget_ns - (time.monotonic_ns() - t_start_ns)
+        return rem_ns / 1e9 if rem_ns > 0 else 0.0
 
     def _budget_exhausted() -> bool:
-        rem = _remaining_s()
-        return rem is not None and rem <= 0.0
-
-    def _cap_tries_by_budget(*, rem_s: float | None, per_attempt_s: float, max_tries_in: int) -> int:
-        if rem_s is None:
-            return max_tries_in
-        # Reserve small overhead per attempt (json parsing, retries, etc.)
-        cost = max(1.0, float(per_attempt_s) + 1.0)
-        return max(1, min(int(max_tries_in), int(rem_s // cost) + 1))
+        return budget_ns is not None and time.monotonic_ns() - t_start_ns >= budget_ns
 
     want = int(n_questions or 0)
     min_q = int(min_questions) if min_questions is not None else want
@@ -203,251 +612,32 @@ def generate_quiz_questions_ai(
     max_tries = max(1, min(int(retries or 1), 8))
 
     for provider in order:
+        spec = providers.get(_PROVIDER_ALIASES.get(provider, provider))
+        if spec is None:
+            continue
         try:
             if _budget_exhausted():
                 errors.append("budget_exhausted")
                 break
-
-            if provider in {"openrouter", "or"}:
-                if not (bool(settings.openrouter_enabled) or bool(runtime_or_enabled)):
-                    continue
-                ok_or, _meta = (False, None)
-                try:
-                    ok_or, _meta = openrouter_healthcheck()
-                except Exception:
-                    ok_or = False
-
-                local_debug = {}
-                best: list[Any] = []
-                best_valid: list[Any] = []
-                last_err = None
-
-                strict_prompt = (
-                    "Ты методист и экзаменатор. Верни ТОЛЬКО валидный JSON без Markdown и без текста вокруг. "
-                    "Язык: русский. Структура строго: {\"questions\":[{" 
-                    "\"type\":\"single\",\"prompt\":\"...\\nA) ...\\nB) ...\\nC) ...\\nD) ...\"," 
-                    "\"correct_answer\":\"A\",\"explanation\":\"...\"}]}. "
-                    "В prompt обязательно 4 варианта A) B) C) D) (каждый с новой строки). "
-                    "correct_answer: строго одна буква A|B|C|D. "
-                    "НЕ допускай, чтобы correct_answer всегда был один и тот же. Разноси ответы по буквам. "
-                    "Вопросы должны проверять смысл, а не формальность. explanation: 1-2 предложения с опорой на текст. "
-                    "Никаких ссылок на внешние знания: только по данному тексту."
-                )
-
-                # Each OpenRouter attempt may take up to its read timeout.
-                # Cap attempts so we stay within the overall budget.
-                rem = _remaining_s()
-                per_attempt = float(getattr(settings, "openrouter_timeout_read", 15.0) or 15.0)
-                cap_tries = _cap_tries_by_budget(rem_s=rem, per_attempt_s=per_attempt, max_tries_in=max_tries)
-                for attempt in range(1, cap_tries + 1):
-                    if _budget_exhausted():
-                        last_err = "budget_exhausted"
-                        break
-                    local_debug = {}
-                    rem_call = _remaining_s()
-                    dyn_read = None
-                    try:
-                        if rem_call is not None:
-                            dyn_read = max(3.0, min(per_attempt, float(rem_call) - 1.0))
-                    except Exception:
-                        dyn_read = None
-                    out = generate_quiz_questions_openrouter(
-                        title=title,
-                        text=text,
-                        n_questions=n_questions,
-                        debug_out=local_debug,
-                        base_url=runtime_or_base_url,
-                        model=runtime_or_model,
-                        system_prompt=strict_prompt,
-                        temperature=0.2,
-                        timeout_read_seconds=dyn_read,
-                    )
-                    valid = _filter_questions(list(out or []), want=want)
-                    if valid and _is_degenerate(valid):
-                        valid = []
-                        local_debug["error"] = "degenerate_answers"
-
-                    # Repair step: if provider returned near-JSON but failed validation/parsing.
-                    # Use its own raw output and ask for strict JSON only.
-                    if (not valid) and attempt < cap_tries:
-                        raw = str(local_debug.get("raw") or "").strip()
-                        if raw and len(raw) >= 20 and str(local_debug.get("error") or "") in {"invalid_json", "schema_validation_failed", "no_valid_questions"}:
-                            repair_debug: dict[str, object] = {}
-                            repaired = generate_quiz_questions_openrouter(
-                                title=title,
-                                text=text,
-                                n_questions=n_questions,
-                                debug_out=repair_debug,
-                                base_url=runtime_or_base_url,
-                                model=runtime_or_model,
-                                system_prompt=strict_prompt,
-                                temperature=0.0,
-                                timeout_read_seconds=dyn_read,
-                                repair_text=raw,
-                            )
-                            repaired_valid = _filter_questions(list(repaired or []), want=want)
-                            if repaired_valid and not _is_degenerate(repaired_valid):
-                                valid = repaired_valid
-                                local_debug["repair_used"] = True
-                                local_debug["repair_error"] = str(repair_debug.get("error") or "")
-
-                    if valid and len(valid) >= min_q:
-                        _set_debug("provider", "openrouter")
-                        _set_debug("provider_error", None)
-                        if debug_out is not None:
-                            debug_out.setdefault("openrouter_attempts", attempt)
-                        return valid
-
-                    if valid and len(valid) > len(best_valid):
-                        best_valid = valid
-                    if out and len(out) > len(best):
-                        best = list(out)
-                    last_err = str(local_debug.get("error") or "empty")
-
-                    if not ok_or:
-                        break
-                    if attempt < max_tries:
-                        time.sleep(max(0.1, float(backoff_seconds) * float(attempt)))
-
-                if best_valid and len(best_valid) >= min_q:
-                    _set_debug("provider", "openrouter")
-                    _set_debug("provider_error", None)
-                    return best_valid
-                errors.append("openrouter:" + str(last_err or "empty"))
-                continue
-
-            if provider == "ollama":
-                rem = _remaining_s()
-                # Ollama can block up to its internal timeouts. Skip if we don't have enough budget.
-                per_attempt = 35.0
-                try:
-                    per_attempt = float(getattr(settings, "ollama_timeout_read", 35.0) or 35.0)
-                except Exception:
-                    per_attempt = 35.0
-                if rem is not None and rem < max(6.0, per_attempt * 0.75):
-                    errors.append("ollama:skipped_budget")
-                    continue
-                eff_ollama_enabled = bool(settings.ollama_enabled) if runtime_ollama_enabled is None else bool(runtime_ollama_enabled)
-                if not eff_ollama_enabled:
-                    continue
-                best_valid: list[Any] = []
-                last_err = None
-                rem = _remaining_s()
-                cap_tries = _cap_tries_by_budget(rem_s=rem, per_attempt_s=per_attempt, max_tries_in=max_tries)
-                for attempt in range(1, cap_tries + 1):
-                    if _budget_exhausted():
-                        last_err = "budget_exhausted"
-                        break
-                    local_debug = {}
-                    rem_call = _remaining_s()
-                    dyn_read = None
-                    try:
-                        if rem_call is not None:
-                            dyn_read = max(4.0, min(per_attempt, float(rem_call) - 1.0))
-                    except Exception:
-                        dyn_read = None
-
-                    out = generate_quiz_questions_ollama(
-                        title=title,
-                        text=text,
-                        n_questions=n_questions,
-                        debug_out=local_debug,
-                        enabled=eff_ollama_enabled,
-                        base_url=runtime_ollama_base_url,
-                        model=runtime_ollama_model,
-                        timeout_read_seconds=dyn_read,
-                    )
-                    valid = _filter_questions(list(out or []), want=want)
-                    if valid and _is_degenerate(valid):
-                        valid = []
-                        local_debug["error"] = "degenerate_answers"
-
-                    if valid and len(valid) > len(best_valid):
-                        best_valid = valid
-                    if valid and len(valid) >= min_q:
-                        _set_debug("provider", "ollama")
-                        _set_debug("provider_error", None)
-                        if debug_out is not None:
-                            debug_out.setdefault("ollama_attempts", attempt)
-                        return valid
-
-                    last_err = str(local_debug.get("error") or "empty")
-                    if attempt < cap_tries:
-                        time.sleep(max(0.1, float(backoff_seconds) * float(attempt)))
-
-                if best_valid and len(best_valid) >= min_q:
-                    _set_debug("provider", "ollama")
-                    _set_debug("provider_error", None)
-                    return best_valid
-
-                errors.append("ollama:" + str(last_err or "empty"))
-                continue
-
-            if provider in {"hf", "hf_router"}:
-                rem = _remaining_s()
-                per_attempt = float(getattr(settings, "hf_router_timeout_read", 12.0) or 12.0)
-                if rem is not None and rem < max(4.0, per_attempt * 0.75):
-                    errors.append("hf_router:skipped_budget")
-                    continue
-                if not (bool(settings.hf_router_enabled) or bool(runtime_hf_enabled)):
-                    continue
-                best_valid: list[Any] = []
-                last_err = None
-                rem = _remaining_s()
-                cap_tries = _cap_tries_by_budget(rem_s=rem, per_attempt_s=per_attempt, max_tries_in=max_tries)
-                for attempt in range(1, cap_tries + 1):
-                    if _budget_exhausted():
-                        last_err = "budget_exhausted"
-                        break
-                    local_debug = {}
-                    rem_call = _remaining_s()
-                    dyn_read = None
-                    try:
-                        if rem_call is not None:
-                            dyn_read = max(3.0, min(per_attempt, float(rem_call) - 1.0))
-                    except Exception:
-                        dyn_read = None
-
-                    out = generate_quiz_questions_hf_router(
-                        title=title,
-                        text=text,
-                        n_questions=n_questions,
-                        debug_out=local_debug,
-                        base_url=runtime_hf_base_url,
-                        model=runtime_hf_model,
-                        timeout_read_seconds=dyn_read,
-                    )
-                    valid = _filter_questions(list(out or []), want=want)
-                    if valid and _is_degenerate(valid):
-                        valid = []
-                        local_debug["error"] = "degenerate_answers"
-
-                    if valid and len(valid) > len(best_valid):
-                        best_valid = valid
-                    if valid and len(valid) >= min_q:
-                        _set_debug("provider", "hf_router")
-                        _set_debug("provider_error", None)
-                        if debug_out is not None:
-                            debug_out.setdefault("hf_router_attempts", attempt)
-                        return valid
-
-                    last_err = str(local_debug.get("error") or "empty")
-                    if attempt < cap_tries:
-                        time.sleep(max(0.1, float(backoff_seconds) * float(attempt)))
-
-                if best_valid and len(best_valid) >= min_q:
-                    _set_debug("provider", "hf_router")
-                    _set_debug("provider_error", None)
-                    return best_valid
-
-                errors.append("hf_router:" + str(last_err or "empty"))
-                continue
+            valid, err = _try_provider(
+                spec,
+                want=want,
+                min_q=min_q,
+                max_tries=max_tries,
+                backoff=float(backoff_seconds),
+                remaining=_remaining_s,
+                debug_out=debug_out,
+            )
         except Exception as e:
             errors.append(provider + ":" + type(e).__name__)
             continue
+        if valid:
+            return valid
+        if err:
+            errors.append(spec.name + ":" + err)
 
-    _set_debug("provider", None)
-    _set_debug("provider_error", ";".join(errors) if errors else "no_provider")
+    _set_debug(debug_out, "provider", None)
+    _set_debug(debug_out, "provider_error", ";".join(errors) if errors else "no_provider")
     if debug_out is not None and "error" not in debug_out:
         debug_out["error"] = "all_failed"
     return []
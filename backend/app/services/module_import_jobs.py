@@ -1,10 +1,20 @@
 from __future__ import annotations
 
+import contextlib
+import errno
+import io
+import json
+import os
 import pathlib
 import tempfile
 import zipfile
 import shutil
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import BinaryIO
 
 import re
 import logging
@@ -25,6 +35,25 @@ from app.core.redis_client import get_redis
 
 log = logging.getLogger(__name__)
 
+_EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+_ZIP_LOCAL_HEADER_SIZE = 30
+_ZIP_EOCD_SIGNATURE = b"PK\x05\x06"
+_ZIP_EOCD_MAX_SIZE = 22 + 0xFFFF
+# General purpose flag bit 11: filename and comment are UTF-8.
+_ZIP_FLAG_UTF8 = 0x800
+_CYR_RE = re.compile(r"[А-Яа-я]")
+
+_SHM_DIR = "/dev/shm"
+# tmpfs pages count against the container's memory limit: keep a margin over the extracted size.
+_SHM_HEADROOM = 1.25
+
+# job id -> (stage, monotonic start). Process-local: a monotonic value is meaningless on
+# another host, so it never goes into shared job meta.
+_stage_clock: dict[str, tuple[str, float]] = {}
+
+_CANCEL_POLL_SECONDS = 1.0
+_cancel_polled_at = 0.0
+
 
 def _publish_admin_jobs_changed(*, job) -> None:
     try:
@@ -34,7 +63,7 @@ def _publish_admin_jobs_changed(*, job) -> None:
         return
 
 
-def _publish_admin_jobs_changed_throttled(*, job, meta: dict, force: bool = False) -> None:
+def _should_publish_admin_jobs_changed(*, meta: dict, force: bool = False) -> bool:
     try:
         now_ms = int(datetime.utcnow().timestamp() * 1000)
         last_ms = 0
@@ -43,11 +72,27 @@ def _publish_admin_jobs_changed_throttled(*, job, meta: dict, force: bool = Fals
         except Exception:
             last_ms = 0
         if (not force) and last_ms and (now_ms - last_ms) < 5000:
-            return
+            return False
         meta["_admin_jobs_pub_at_ms"] = now_ms
-        _publish_admin_jobs_changed(job=job)
+        return True
     except Exception:
-        return
+        return False
+
+
+def _save_job_meta(*, job, meta: dict, force_publish: bool = False) -> None:
+    """Persist job meta and notify the admin jobs list in a single round-trip."""
+    publish = _should_publish_admin_jobs_changed(meta=meta, force=force_publish)
+    job.meta = meta
+    try:
+        pipe = job.connection.pipeline(transaction=False)
+        pipe.hset(job.key, "meta", job.serializer.dumps(meta))
+        if publish:
+            pipe.publish("admin:jobs:changed", str(getattr(job, "id", "") or "1"))
+        pipe.execute()
+    except Exception:
+        job.save_meta()
+        if publish:
+            _publish_admin_jobs_changed(job=job)
 
 
 def _set_job_stage(*, stage: str, detail: str | None = None) -> None:
@@ -59,43 +104,64 @@ def _set_job_stage(*, stage: str, detail: str | None = None) -> None:
         return
 
     try:
-        now = datetime.utcnow()
         meta = dict(job.meta or {})
 
         # Stage timing
-        # - stage_started_at: when current stage began
+        # - stage_started_at: when current stage began (wall clock, for the UI)
         # - stage_durations_s: {stage: seconds}
         # - job_started_at: when first stage was observed
+        # Durations use this process's monotonic clock (_stage_clock) when it saw the stage
+        # start, else the stage_started_at wall-clock timestamp (e.g. another worker wrote it).
         prev_stage = str(meta.get("stage") or "")
-        prev_started_at = str(meta.get("stage_started_at") or "")
-        if not meta.get("job_started_at"):
-            meta["job_started_at"] = now.isoformat()
-
-        if prev_stage and prev_started_at and prev_stage != str(stage):
-            try:
-                prev_dt = datetime.fromisoformat(prev_started_at)
-                dur = max(0.0, (now - prev_dt).total_seconds())
-                durs = dict(meta.get("stage_durations_s") or {})
-                durs[prev_stage] = float(durs.get(prev_stage) or 0.0) + float(dur)
-                meta["stage_durations_s"] = durs
-            except Exception:
-                pass
+        stage_changed = prev_stage != str(stage)
+        if not stage_changed and detail is None:
+            # Nothing to record; skip the Redis write and publish.
+            return
 
-        meta["stage"] = str(stage)
-        meta["stage_at"] = now.isoformat()
-        meta["stage_started_at"] = now.isoformat()
+        if stage_changed:
+            job_id = str(getattr(job, "id", "") or "")
+            now_mono = time.monotonic()
+            now = datetime.utcnow()
+            now_iso = now.isoformat()
+            if not meta.get("job_started_at"):
+                meta["job_started_at"] = now_iso
+
+            if prev_stage:
+                dur: float | None = None
+                local = _stage_clock.get(job_id)
+                if local is not None and local[0] == prev_stage:
+                    dur = now_mono - local[1]
+                else:
+                    try:
+                        dur = (now - datetime.fromisoformat(str(meta.get("stage_started_at") or ""))).total_seconds()
+                    except Exception:
+                        dur = None
+                if dur is not None:
+                    durs = dict(meta.get("stage_durations_s") or {})
+                    durs[prev_stage] = float(durs.get(prev_stage) or 0.0) + max(0.0, dur)
+                    meta["stage_durations_s"] = durs
+
+            meta["stage"] = str(stage)
+            meta["stage_at"] = now_iso
+            meta["stage_started_at"] = now_iso
+            meta.pop("_stage_started_mono", None)
+            if stage in {"done", "failed", "canceled"}:
+                _stage_clock.pop(job_id, None)
+            else:
+                _stage_clock[job_id] = (str(stage), now_mono)
+        # Re-entering the current stage (e.g. to update detail) keeps its start and
+        # skips the timestamps entirely; heartbeats keep stage_at fresh.
         if detail is not None:
             meta["detail"] = str(detail)
-        _publish_admin_jobs_changed_throttled(job=job, meta=meta, force=True)
-        job.meta = meta
-        job.save_meta()
+        _save_job_meta(job=job, meta=meta, force_publish=True)
     except Exception:
         return
 
 
-def _job_heartbeat(*, detail: str | None = None) -> None:
+def _job_heartbeat(*, detail: str | None = None, job=None) -> None:
     try:
-        job = get_current_job()
+        if job is None:
+            job = get_current_job()
     except Exception:
         return
 
@@ -117,21 +183,29 @@ def _job_heartbeat(*, detail: str | None = None) -> None:
         if detail is not None:
             meta["detail"] = str(detail)
         meta["_heartbeat_at"] = now
-        _publish_admin_jobs_changed_throttled(job=job, meta=meta, force=False)
-        job.meta = meta
-        job.save_meta()
+        _save_job_meta(job=job, meta=meta, force_publish=False)
     except Exception:
         return
 
 
-def _is_cancel_requested() -> bool:
+def _is_cancel_requested(*, job=None) -> bool:
     try:
-        job = get_current_job()
+        if job is None:
+            job = get_current_job()
     except Exception:
         job = None
     if job is None:
         return False
+    global _cancel_polled_at
     try:
+        # The admin API sets cancel_requested in Redis; job.meta is only our
+        # local copy. Re-read it at most once per _CANCEL_POLL_SECONDS so the
+        # per-chunk checkpoints do not each cost a round-trip, and so the next
+        # meta save does not overwrite the flag.
+        now = time.monotonic()
+        if now - _cancel_polled_at >= _CANCEL_POLL_SECONDS:
+            _cancel_polled_at = now
+            job.get_meta(refresh=True)
         meta = dict(job.meta or {})
         return bool(meta.get("cancel_requested"))
     except Exception:
@@ -200,15 +274,106 @@ def _set_job_error(*, error: Exception, error_code: str | None = None, error_hin
         meta["error_message"] = msg
         if hint:
             meta["error_hint"] = hint
-        _publish_admin_jobs_changed_throttled(job=job, meta=meta, force=True)
-        job.meta = meta
-        job.save_meta()
+        _save_job_meta(job=job, meta=meta, force_publish=True)
     except Exception:
         return
 
 
-def _safe_extract_zip(*, zf: zipfile.ZipFile, dest: pathlib.Path) -> None:
+def _name_score(s: str) -> int:
+    # Prefer decodings with Cyrillic letters and without replacement chars.
+    cyr = len(_CYR_RE.findall(s))
+    bad = s.count("�") + s.count("?")
+    return cyr * 10 - bad
+
+
+def _copy_stored_member(
+    *,
+    member: zipfile.ZipInfo,
+    target: pathlib.Path,
+    data: bytes | None,
+    raw_fd: int | None,
+) -> bool:
+    """Copy an uncompressed (STORED) entry straight out of the archive bytes.
+
+    `data` is the whole in-memory archive, `raw_fd` a descriptor of the archive
+    on disk. Returns False when the fast path does not apply and the entry must
+    go through ZipFile.open. Like ZipFile.open, the local header's name must
+    match the central directory and the data's CRC-32 must match, otherwise
+    zipfile.BadZipFile is raised.
+    """
+    if member.compress_type != zipfile.ZIP_STORED or member.flag_bits & 0x1:
+        return False
+    offset = int(member.header_offset)
+    if data is not None:
+        header = data[offset : offset + _ZIP_LOCAL_HEADER_SIZE]
+    elif raw_fd is not None:
+        header = os.pread(raw_fd, _ZIP_LOCAL_HEADER_SIZE, offset)
+    else:
+        return False
+    if len(header) != _ZIP_LOCAL_HEADER_SIZE or header[:4] != b"PK\x03\x04":
+        return False
+    # The local header's name/extra lengths may differ from the central directory.
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    name_at = offset + _ZIP_LOCAL_HEADER_SIZE
+    start = name_at + name_len + extra_len
+    size = int(member.file_size)
+    if data is not None and start + size > len(data):
+        return False
+    fname = data[name_at : name_at + name_len] if data is not None else os.pread(raw_fd, name_len, name_at)
+    fname_str = fname.decode("utf-8" if member.flag_bits & _ZIP_FLAG_UTF8 else "cp437", errors="replace")
+    if fname_str != member.orig_filename:
+        raise zipfile.BadZipFile(f"file name in directory {member.orig_filename!r} and header {fname!r} differ")
+
+    crc = 0
+    with open(target, "wb") as out:
+        if data is not None:
+            chunk = memoryview(data)[start : start + size]
+            crc = zlib.crc32(chunk)
+            out.write(chunk)
+        else:
+            # Read through userspace (not sendfile) so the CRC can be checked as we copy.
+            done = 0
+            while done < size:
+                chunk = os.pread(raw_fd, min(1024 * 1024, size - done), start + done)
+                if not chunk:
+                    raise zipfile.BadZipFile(f"truncated stored entry: {member.filename}")
+                crc = zlib.crc32(chunk, crc)
+                out.write(chunk)
+                done += len(chunk)
+    if crc != member.CRC:
+        raise zipfile.BadZipFile(f"bad CRC-32 for file {member.filename!r}")
+    return True
+
+
+def _extract_members(
+    *,
+    zf: zipfile.ZipFile,
+    items: list[tuple[pathlib.Path, zipfile.ZipInfo]],
+    data: bytes | None = None,
+    raw_fd: int | None = None,
+) -> None:
+    for target, member in items:
+        if _copy_stored_member(member=member, target=target, data=data, raw_fd=raw_fd):
+            continue
+        with zf.open(member) as src, open(target, "wb") as out:
+            shutil.copyfileobj(src, out, length=1024 * 1024)
+
+
+def _safe_extract_zip(
+    *,
+    zf: zipfile.ZipFile,
+    dest: pathlib.Path,
+    zip_src: io.BytesIO | pathlib.Path | None = None,
+) -> None:
+    """Validate and extract `zf` into `dest`.
+
+    Limits and path checks run serially over the central directory; when
+    `zip_src` (the archive `zf` was opened from) is given, file data is then
+    extracted by a small thread pool.
+    """
     dest = dest.resolve()
+    dest_str = str(dest)
+    dest_prefix = dest_str.rstrip(os.sep) + os.sep
     max_files = int(getattr(settings, "import_zip_max_files", 12000) or 12000)
     max_total = int(getattr(settings, "import_zip_max_uncompressed_bytes", 2_500_000_000) or 2_500_000_000)
     max_entry = int(getattr(settings, "import_zip_max_entry_bytes", 750_000_000) or 750_000_000)
@@ -216,10 +381,13 @@ def _safe_extract_zip(*, zf: zipfile.ZipFile, dest: pathlib.Path) -> None:
 
     extracted_files = 0
     total_uncompressed = 0
+    planned: dict[pathlib.Path, zipfile.ZipInfo] = {}
 
     for member in zf.infolist():
         name = member.filename
-        if name:
+        # Names flagged UTF-8 were decoded correctly by zipfile, and ASCII names
+        # read the same in every candidate encoding.
+        if name and not (member.flag_bits & _ZIP_FLAG_UTF8) and not name.isascii():
             try:
                 raw = name.encode("cp437", errors="replace")
                 candidates: list[str] = []
@@ -229,14 +397,9 @@ def _safe_extract_zip(*, zf: zipfile.ZipFile, dest: pathlib.Path) -> None:
                     except Exception:
                         continue
 
-                def score(s: str) -> int:
-                    cyr = len(re.findall(r"[А-Яа-я]", s))
-                    bad = s.count("�") + s.count("?")
-                    return cyr * 10 - bad
-
                 if candidates:
-                    best = max(candidates, key=score)
-                    if score(best) > score(name):
+                    best = max(candidates, key=_name_score)
+                    if _name_score(best) > _name_score(name):
                         name = best
             except Exception:
                 pass
@@ -270,12 +433,137 @@ def _safe_extract_zip(*, zf: zipfile.ZipFile, dest: pathlib.Path) -> None:
             if ratio > float(max_ratio) and file_size > 10_000_000:
                 raise ValueError(f"zip suspicious compression ratio: {ratio:.1f} > {max_ratio}: {name}")
 
-        target = (dest / name).resolve()
-        if not str(target).startswith(str(dest)):
+        # Lexical zip-slip check: `dest` is already resolved and nothing we
+        # extract is a symlink, so resolving every entry (stat/readlink per
+        # path component) is unnecessary. Windows parsing treats both / and \
+        # as separators and catches drive letters and rooted names.
+        win_name = pathlib.PureWindowsPath(name)
+        if win_name.anchor or ".." in win_name.parts:
             continue
-        target.parent.mkdir(parents=True, exist_ok=True)
-        with zf.open(member) as src, open(target, "wb") as out:
-            shutil.copyfileobj(src, out, length=1024 * 1024)
+        target = pathlib.Path(os.path.normpath(os.path.join(dest_str, name)))
+        if not str(target).startswith(dest_prefix):
+            continue
+        # Later duplicates win, as they did when extracting sequentially.
+        planned[target] = member
+
+    # One mkdir per distinct leaf directory: creating the leaves (parents=True)
+    # also creates every ancestor, so ancestors need no call of their own.
+    dirs = {t.parent for t in planned}
+    ancestors = {a for d in dirs for a in d.parents}
+    for d in sorted(dirs - ancestors):
+        d.mkdir(parents=True, exist_ok=True)
+
+    items = list(planned.items())
+    data = zip_src.getvalue() if isinstance(zip_src, io.BytesIO) else None
+    raw_fd = (
+        os.open(zip_src, os.O_RDONLY)
+        if isinstance(zip_src, pathlib.Path) and hasattr(os, "pread")
+        else None
+    )
+    try:
+        workers = min(_EXTRACT_WORKERS, len(items))
+        if zip_src is None or workers <= 1:
+            _extract_members(zf=zf, items=items, data=data, raw_fd=raw_fd)
+            return
+
+        # Deflate releases the GIL, so entries inflate in parallel. ZipFile handles
+        # are not thread-safe: every worker opens its own over the same archive.
+        def _worker(chunk: list[tuple[pathlib.Path, zipfile.ZipInfo]]) -> None:
+            with zipfile.ZipFile(io.BytesIO(data) if data is not None else zip_src, "r") as wzf:
+                _extract_members(zf=wzf, items=chunk, data=data, raw_fd=raw_fd)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zip_extract") as pool:
+            futures = [pool.submit(_worker, items[i::workers]) for i in range(workers)]
+            for fut in futures:
+                fut.result()
+    finally:
+        if raw_fd is not None:
+            os.close(raw_fd)
+
+
+def _import_tmp_root(uncompressed_bytes: int) -> str | None:
+    """Extraction dir for an import: tmpfs when the extracted tree comfortably fits, else $TMPDIR.
+
+    Extracted files are written once and read back by the importer, so keeping
+    them in RAM takes disk bandwidth out of both stages. The size is the sum of
+    the central directory's uncompressed sizes, not the archive's.
+    """
+    if uncompressed_bytes <= 0 or not os.path.isdir(_SHM_DIR):
+        return None
+    try:
+        free = shutil.disk_usage(_SHM_DIR).free
+    except OSError:
+        return None
+    return _SHM_DIR if uncompressed_bytes * _SHM_HEADROOM <= free else None
+
+
+def _extract_to_work_dir(
+    *,
+    zf: zipfile.ZipFile,
+    zip_src: io.BytesIO | pathlib.Path,
+    work: contextlib.ExitStack,
+) -> pathlib.Path:
+    """Extract `zf` into a fresh work dir owned by `work` and return it.
+
+    tmpfs is picked from the uncompressed size; if it still fills up (ENOSPC,
+    e.g. a concurrent import took the space) extraction is redone on disk.
+    """
+    uncompressed = sum(max(0, int(zi.file_size or 0)) for zi in zf.infolist())
+    shm_root = _import_tmp_root(uncompressed)
+    if shm_root is not None:
+        shm_td = tempfile.TemporaryDirectory(dir=shm_root)
+        try:
+            _safe_extract_zip(zf=zf, dest=pathlib.Path(shm_td.name), zip_src=zip_src)
+        except OSError as e:
+            shm_td.cleanup()
+            if e.errno != errno.ENOSPC:
+                raise
+            log.warning("import_module_zip_job: %s full, extracting to disk instead", shm_root)
+        except BaseException:
+            shm_td.cleanup()
+            raise
+        else:
+            return pathlib.Path(work.enter_context(shm_td))
+
+    base = pathlib.Path(work.enter_context(tempfile.TemporaryDirectory()))
+    _safe_extract_zip(zf=zf, dest=base, zip_src=zip_src)
+    return base
+
+
+def _zip_tail_has_eocd(*, s3, s3_object_key: str) -> bool:
+    # EOCD is 22 bytes plus a comment of up to 64 KiB at the very end.
+    try:
+        resp = s3.get_object(Bucket=settings.s3_bucket, Key=s3_object_key, Range=f"bytes=-{_ZIP_EOCD_MAX_SIZE}")
+        body = resp.get("Body")
+        try:
+            tail = body.read() if body is not None else b""
+        finally:
+            if body is not None:
+                body.close()
+    except Exception:
+        # Preflight only: let the full download surface real S3 errors.
+        return True
+    return _ZIP_EOCD_SIGNATURE in tail
+
+
+def _download_zip_body(*, body, s3_object_key: str, out: BinaryIO) -> int:
+    size = 0
+    try:
+        while True:
+            _cancel_checkpoint(s3_object_key=s3_object_key, stage="download")
+            _job_heartbeat(detail=f"download: {s3_object_key}")
+            chunk = body.read(1024 * 1024) if body is not None else b""
+            if not chunk:
+                break
+            out.write(chunk)
+            size += len(chunk)
+    finally:
+        try:
+            if body is not None:
+                body.close()
+        except Exception:
+            pass
+    return size
 
 
 def import_module_zip_job(
@@ -329,78 +617,81 @@ def import_module_zip_job(
 
     _cancel_checkpoint(s3_object_key=s3_object_key, stage="start")
 
-    with tempfile.TemporaryDirectory() as td:
-        base = pathlib.Path(td)
-        zip_path = base / "module.zip"
+    _set_job_stage(stage="download", detail=s3_object_key)
+
+    # The one GET is also the existence check (404 -> ClientError) and gives
+    # ContentLength; its body is what gets downloaded, whatever the size.
+    try:
+        resp = s3.get_object(Bucket=settings.s3_bucket, Key=s3_object_key)
+    except ClientError as e:
+        code = str((e.response or {}).get("Error", {}).get("Code") or "")
+        status = int((e.response or {}).get("ResponseMetadata", {}).get("HTTPStatusCode") or 0)
+        if status == 404 or code in {"404", "NoSuchKey", "NotFound"}:
+            err = FileNotFoundError(f"s3 object not found: {s3_object_key}")
+            _set_job_stage(stage="failed", detail=str(err))
+            _set_job_error(
+                error=err,
+                error_code="IMPORT_SOURCE_ZIP_NOT_FOUND",
+                error_hint=(
+                    "Исходный ZIP не найден в S3/MinIO. Возможные причины: загрузка не завершилась, "
+                    "ключ объекта неверный, либо файл был удалён TTL-cleanup. Попробуйте загрузить ZIP заново."
+                ),
+            )
+            raise err
+        raise
+
+    body = resp.get("Body")
+    try:
+        content_length = int(resp.get("ContentLength") or 0)
+    except Exception:
+        content_length = 0
 
-        _set_job_stage(stage="download", detail=s3_object_key)
-        _cancel_checkpoint(s3_object_key=s3_object_key, stage="download")
+    # The archive is staged on disk (or in memory); the extracted tree gets its own
+    # work dir, chosen once the central directory's uncompressed size is known.
+    with tempfile.TemporaryDirectory() as td, contextlib.ExitStack() as work:
+        zip_path = pathlib.Path(td) / "module.zip"
         log.info("import_module_zip_job: downloading from minio key=%s -> %s", s3_object_key, str(zip_path))
 
-        try:
-            s3.head_object(Bucket=settings.s3_bucket, Key=s3_object_key)
-        except ClientError as e:
-            code = str((e.response or {}).get("Error", {}).get("Code") or "")
-            status = int((e.response or {}).get("ResponseMetadata", {}).get("HTTPStatusCode") or 0)
-            if status == 404 or code in {"404", "NoSuchKey", "NotFound"}:
-                err = FileNotFoundError(f"s3 object not found: {s3_object_key}")
+        max_in_memory = int(getattr(settings, "import_zip_in_memory_max_bytes", 0) or 0)
+
+        # IMPORTANT: allow cancellation during download (checked between chunks).
+        # Archives up to import_zip_in_memory_max_bytes are streamed into memory
+        # and handed to ZipFile directly; larger ones are streamed to zip_path.
+        zip_src: io.BytesIO | pathlib.Path
+        if 0 < content_length <= max_in_memory:
+            zip_src = io.BytesIO()
+            size = _download_zip_body(body=body, s3_object_key=s3_object_key, out=zip_src)
+            zip_src.seek(0)
+        else:
+            # Fail fast on uploads that are not ZIPs before pulling the whole
+            # object: the end-of-central-directory record lives in the tail.
+            if not _zip_tail_has_eocd(s3=s3, s3_object_key=s3_object_key):
+                if body is not None:
+                    body.close()
+                err = zipfile.BadZipFile("bad zip file: end of central directory not found")
                 _set_job_stage(stage="failed", detail=str(err))
-                _set_job_error(
-                    error=err,
-                    error_code="IMPORT_SOURCE_ZIP_NOT_FOUND",
-                    error_hint=(
-                        "Исходный ZIP не найден в S3/MinIO. Возможные причины: загрузка не завершилась, "
-                        "ключ объекта неверный, либо файл был удалён TTL-cleanup. Попробуйте загрузить ZIP заново."
-                    ),
-                )
+                _set_job_error(error=err)
                 raise err
-            raise
-
-        # IMPORTANT: allow cancellation during download.
-        # boto3.download_fileobj blocks for a long time and cannot be interrupted.
-        # Use get_object streaming and check cancel_requested between chunks.
-        with zip_path.open("wb") as f:
-            resp = s3.get_object(Bucket=settings.s3_bucket, Key=s3_object_key)
-            body = resp.get("Body")
-            try:
-                while True:
-                    _cancel_checkpoint(s3_object_key=s3_object_key, stage="download")
-                    _job_heartbeat(detail=f"download: {s3_object_key}")
-                    chunk = body.read(1024 * 1024) if body is not None else b""
-                    if not chunk:
-                        break
-                    f.write(chunk)
-            finally:
-                try:
-                    if body is not None:
-                        body.close()
-                except Exception:
-                    pass
+            with open(zip_path, "wb") as out:
+                size = _download_zip_body(body=body, s3_object_key=s3_object_key, out=out)
+            zip_src = zip_path
 
-        _cancel_checkpoint(s3_object_key=s3_object_key, stage="download")
-
-        size = None
-        try:
-            size = int(zip_path.stat().st_size)
-        except Exception:
-            size = None
-
-        log.info("import_module_zip_job: download done bytes=%s", size)
+        log.info("import_module_zip_job: download done bytes=%s in_memory=%s", size, isinstance(zip_src, io.BytesIO))
 
         _set_job_stage(stage="extract")
         _cancel_checkpoint(s3_object_key=s3_object_key, stage="extract")
-        with zipfile.ZipFile(str(zip_path), "r") as zf:
-            log.info("import_module_zip_job: extracting zip to %s", str(base))
+        with zipfile.ZipFile(zip_src, "r") as zf:
             _job_heartbeat(detail="extract: start")
-            _safe_extract_zip(zf=zf, dest=base)
+            base = _extract_to_work_dir(zf=zf, zip_src=zip_src, work=work)
             _job_heartbeat(detail="extract: done")
-        log.info("import_module_zip_job: extract done")
+        log.info("import_module_zip_job: extract done dir=%s", str(base))
 
         _cancel_checkpoint(s3_object_key=s3_object_key, stage="extract")
 
         inferred_title: str | None = None
         if source_filename:
-            inferred_title = re.sub(r"\.zip$", "", str(source_filename).strip(), flags=re.IGNORECASE).strip() or None
+            name = str(source_filename).strip()
+            inferred_title = (name[:-4] if name.lower().endswith(".zip") else name).strip() or None
 
         # Determine module root folder.
         # Real-world ZIPs may contain:
@@ -476,6 +767,9 @@ def import_module_zip_job(
             _set_job_stage(stage="commit")
             _cancel_checkpoint(s3_object_key=s3_object_key, stage="commit")
             db.commit()
+            # Nothing below touches the DB: hand the session's resources back now
+            # rather than when the regen enqueue retries finish.
+            db.close()
             log.info("import_module_zip_job: commit done module_id=%s", str(mid))
 
             # If cancellation was requested right after commit, stop before any follow-up actions.
@@ -545,9 +839,12 @@ def import_module_zip_job(
                                 "actor_user_id": str(actor_user_id or ""),
                                 "source": "auto_after_import",
                             }
-                            r.lpush("admin:regen_jobs", json.dumps(meta, ensure_ascii=False))
-                            r.ltrim("admin:regen_jobs", 0, 49)
-                            r.expire("admin:regen_jobs", 60 * 60 * 24 * 30)
+                            payload = json.dumps(meta, ensure_ascii=False, separators=(",", ":"))
+                            with r.pipeline(transaction=False) as pipe:
+                                pipe.lpush("admin:regen_jobs", payload)
+                                pipe.ltrim("admin:regen_jobs", 0, 49)
+                                pipe.expire("admin:regen_jobs", 60 * 60 * 24 * 30)
+                                pipe.execute()
                         except Exception:
                             pass
 
@@ -556,8 +853,6 @@ def import_module_zip_job(
                     except Exception as e:
                         last_err = e
                         try:
-                            import time
-
                             time.sleep(0.25 * attempt)
                         except Exception:
                             pass
@@ -1,13 +1,23 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import logging
 import mimetypes
+import multiprocessing
+import os
 import pathlib
 import re
 import random
+import time
 import uuid
 import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+from xml.etree import ElementTree
 
+from boto3.s3.transfer import TransferConfig
 from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from rq import get_current_job
@@ -25,52 +35,109 @@ from app.services.storage import ensure_bucket_exists, get_s3_client
 
 log = logging.getLogger(__name__)
 
+_RE_TITLE_PREFIX = re.compile(r"^\s*\d+\s*[.)_-]*\s*")
+_RE_EXT = re.compile(r"\.[a-zA-Z0-9]+$")
+_RE_ORDER = re.compile(r"^\s*(\d{1,3})")
+_RE_WS = re.compile(r"\s+")
+# Only whitespace that actually changes: runs of 2+ and lone tabs (single spaces are left alone).
+_RE_HSPACE = re.compile(r"[ \t]{2,}|\t")
+_NBSP_TO_SPACE = str.maketrans({"\u00a0": " "})
+_RE_LIST_ITEM = re.compile(r"^(?:-\s+|\d{1,3}[.)]\s+)")
+_RE_BULLET = re.compile(r"^(?:•\s*|\*\s+)")
+_RE_BLANK3 = re.compile(r"\n{3,}")
+_RE_XML_P = re.compile(r"</w:p>")
+_RE_XML_TAG = re.compile(r"<[^>]+>")
 
-def _set_job_detail(detail: str) -> None:
+
+# Job meta updates (detail text, uploaded keys) are coalesced and written at most every
+# _META_FLUSH_INTERVAL_SECONDS instead of one save_meta() round-trip per file.
+_META_FLUSH_INTERVAL_SECONDS = 0.5
+_meta_pending: dict[str, object] = {}
+_meta_pending_keys: list[str] = []
+_meta_flushed_at = 0.0
+
+
+_UPLOADED_KEYS_MAX = 2000
+_UPLOADED_KEYS_TTL_SECONDS = 7 * 24 * 3600
+
+
+def uploaded_keys_redis_key(job_id: str) -> str:
+    return f"rq:job:{job_id}:uploaded_keys"
+
+
+def load_uploaded_keys(job) -> list[str]:
+    """Object keys written by an import job (Redis list, plus legacy job.meta entries)."""
+
+    keys: list[str] = []
     try:
-        job = get_current_job()
+        keys.extend(str(k) for k in (get_redis().lrange(uploaded_keys_redis_key(str(job.id)), 0, -1) or []))
     except Exception:
-        job = None
-    if job is None:
-        return
+        pass
     try:
-        meta = dict(job.meta or {})
-        meta["detail"] = str(detail)
-        job.meta = meta
-        job.save_meta()
+        keys.extend(str(k) for k in ((job.meta or {}).get("uploaded_keys") or []))
     except Exception:
-        return
+        pass
+    return list(dict.fromkeys(k.strip() for k in keys if str(k or "").strip()))
 
 
-def _track_uploaded_key(object_key: str) -> None:
+def _flush_job_meta(*, force: bool = False) -> None:
+    global _meta_flushed_at
+    if not _meta_pending and not _meta_pending_keys:
+        return
+    now = time.monotonic()
+    if not force and now - _meta_flushed_at < _META_FLUSH_INTERVAL_SECONDS:
+        return
     try:
         job = get_current_job()
     except Exception:
         job = None
-    if job is None:
-        return
     try:
-        meta = dict(job.meta or {})
-        keys = list(meta.get("uploaded_keys") or [])
-        k = str(object_key or "").strip()
-        if k and k not in keys:
-            keys.append(k)
-            # Keep last N keys to avoid unbounded growth.
-            meta["uploaded_keys"] = keys[-2000:]
+        if job is None:
+            return
+        if _meta_pending_keys:
+            # A capped Redis list: O(1) per key instead of rewriting the whole pickled meta.
+            list_key = uploaded_keys_redis_key(str(job.id))
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.lpush(list_key, *_meta_pending_keys)
+            pipe.ltrim(list_key, 0, _UPLOADED_KEYS_MAX - 1)
+            pipe.expire(list_key, _UPLOADED_KEYS_TTL_SECONDS)
+            pipe.execute()
+        if _meta_pending:
+            meta = dict(job.meta or {})
+            meta.update(_meta_pending)
             job.meta = meta
             job.save_meta()
     except Exception:
         return
+    finally:
+        _meta_pending.clear()
+        _meta_pending_keys.clear()
+        _meta_flushed_at = now
+
+
+def _set_job_detail(detail: str) -> None:
+    _meta_pending["detail"] = str(detail)
+    _flush_job_meta()
+
+
+def _track_uploaded_key(object_key: str) -> None:
+    k = str(object_key or "").strip()
+    if not k:
+        return
+    _meta_pending_keys.append(k)
+    _flush_job_meta()
 
 
+@functools.lru_cache(maxsize=8192)
 def _guess_title(name: str) -> str:
-    s = re.sub(r"^\s*\d+\s*[.)_-]*\s*", "", name)
-    s = re.sub(r"\.[a-zA-Z0-9]+$", "", s)
+    s = _RE_TITLE_PREFIX.sub("", name)
+    s = _RE_EXT.sub("", s)
     return s.strip() or name
 
 
+@functools.lru_cache(maxsize=8192)
 def _parse_order(name: str, fallback: int) -> int:
-    m = re.match(r"^\s*(\d{1,3})", (name or "").strip())
+    m = _RE_ORDER.match((name or "").strip())
     if not m:
         return fallback
     try:
@@ -90,23 +157,48 @@ def _is_module_material(path: pathlib.Path) -> bool:
     return path.suffix.lower() in {".xlsx", ".xls", ".pptx", ".ppt", ".zip", ".rar", ".7z"}
 
 
-def _should_ignore_file(p: pathlib.Path) -> bool:
-    n = str(p.name or "").strip().lower()
+@functools.lru_cache(maxsize=8192)
+def _is_ignored_name(name: str) -> bool:
+    n = str(name or "").strip().lower()
     if not n:
         return True
-    if p.name.startswith("._"):
-        return True
+    return name.startswith("._") or n == ".ds_store"
+
+
+def _should_ignore_file(p: pathlib.Path) -> bool:
+    # __MACOSX trees are pruned by the walkers at directory level, so only the name matters here.
+    return _is_ignored_name(p.name)
+
+
+# Asset ordering priority by extension: smaller number -> earlier; anything else is 9.
+_EXT_PRIORITY: dict[str, int] = {
+    "md": 0,
+    "txt": 0,
+    "pdf": 1,
+    "png": 2,
+    "jpg": 2,
+    "jpeg": 2,
+    "webp": 2,
+    "gif": 2,
+    "mp4": 3,
+    "webm": 3,
+    "mov": 3,
+    "mkv": 3,
+    "mp3": 4,
+    "wav": 4,
+    "ogg": 4,
+    "m4a": 4,
+}
+
+
+def _asset_rel_name(*, fp: pathlib.Path, lesson_root: pathlib.Path) -> str:
     try:
-        parts = {x for x in p.parts}
-        if "__MACOSX" in parts:
-            return True
+        return str(fp.relative_to(lesson_root).as_posix())
     except Exception:
-        pass
+        return str(fp.name or "")
 
-    return False
 
-
-def _asset_sort_key(*, fp: pathlib.Path, lesson_root: pathlib.Path) -> tuple[int, int, str]:
+def _asset_sort_key(*, fp: pathlib.Path, rel_name: str) -> tuple[int, int, str]:
     """Stable ordering for lesson assets.
 
     Goals:
@@ -115,80 +207,161 @@ def _asset_sort_key(*, fp: pathlib.Path, lesson_root: pathlib.Path) -> tuple[int
       (e.g. malformed package), keep them first to reduce confusion.
     """
 
-    try:
-        rel = fp.relative_to(lesson_root)
-        rel_name = str(rel.as_posix())
-    except Exception:
-        rel_name = str(fp.name or "")
-
     ext = ""
     try:
         ext = str(fp.suffix or "").lower().lstrip(".")
     except Exception:
         ext = ""
 
-    # priority: smaller number -> earlier
-    if ext in {"md", "txt"}:
-        pri = 0
-    elif ext in {"pdf"}:
-        pri = 1
-    elif ext in {"png", "jpg", "jpeg", "webp", "gif"}:
-        pri = 2
-    elif ext in {"mp4", "webm", "mov", "mkv"}:
-        pri = 3
-    elif ext in {"mp3", "wav", "ogg", "m4a"}:
-        pri = 4
-    else:
-        pri = 9
+    pri = _EXT_PRIORITY.get(ext, 9)
 
     # Keep root-level files before deeply nested ones (nice UX).
     depth = rel_name.count("/")
     return (pri, depth, rel_name.casefold())
 
 
+@dataclass(frozen=True, slots=True)
+class _LessonFile:
+    path: pathlib.Path
+    rel_name: str
+    is_theory: bool
+    sort_key: tuple[int, int, str]
+
+
+def _scan_lesson_files(paths: Iterable[pathlib.Path], *, lesson_root: pathlib.Path) -> list[_LessonFile]:
+    # Paths come from the importer's own listings (already regular files); keeps input order, drops duplicates.
+    out: list[_LessonFile] = []
+    seen: set[pathlib.Path] = set()
+    for fp in paths:
+        if fp in seen or _should_ignore_file(fp):
+            continue
+        seen.add(fp)
+        rel_name = _asset_rel_name(fp=fp, lesson_root=lesson_root)
+        out.append(
+            _LessonFile(
+                path=fp,
+                rel_name=rel_name,
+                is_theory=_is_theory_file(fp),
+                sort_key=_asset_sort_key(fp=fp, rel_name=rel_name),
+            )
+        )
+    return out
+
+
+def _iter_files(root: pathlib.Path) -> Iterator[pathlib.Path]:
+    # os.scandir reuses the dirent type, so no extra stat per entry (unlike rglob + is_file).
+    stack = [str(root)]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                try:
+                    if e.is_symlink():
+                        continue
+                    if e.is_dir(follow_symlinks=False):
+                        if e.name != "__MACOSX":
+                            stack.append(e.path)
+                    elif e.is_file(follow_symlinks=False) and not _is_ignored_name(e.name):
+                        yield pathlib.Path(e.path)
+                except OSError:
+                    continue
+
+
+def _scan_dir(root: pathlib.Path) -> tuple[list[pathlib.Path], list[pathlib.Path]]:
+    """Direct (files, subdirectories) of root from a single os.scandir pass.
+
+    DirEntry caches the dirent type, so sorting children into files and dirs needs no
+    per-entry stat. Ignored files and __MACOSX are dropped; OSError on root propagates.
+    """
+
+    files: list[pathlib.Path] = []
+    dirs: list[pathlib.Path] = []
+    with os.scandir(root) as it:
+        for e in it:
+            try:
+                if e.is_dir():
+                    if e.name != "__MACOSX":
+                        dirs.append(pathlib.Path(e.path))
+                elif e.is_file() and not _is_ignored_name(e.name):
+                    files.append(pathlib.Path(e.path))
+            except OSError:
+                continue
+    return files, dirs
+
+
 def _list_files_recursive(root: pathlib.Path) -> list[pathlib.Path]:
     try:
-        return sorted([p for p in root.rglob("*") if p.is_file() and not _should_ignore_file(p)])
+        return sorted(_iter_files(root))
     except Exception:
         return []
 
 
-def _has_any_lesson_content(root: pathlib.Path) -> bool:
-    for fp in _list_files_recursive(root):
-        if _is_lesson_asset(fp) or _is_module_material(fp) or _is_theory_file(fp):
-            return True
-    return False
+def _has_any_lesson_content(root: pathlib.Path, cache: dict[str, object] | None = None) -> bool:
+    # Every non-ignored file counts as lesson content (_is_lesson_asset is always True),
+    # so stop at the first one instead of listing and sorting the whole tree.
+    key = f"has:{root}"
+    if cache is not None and key in cache:
+        return bool(cache[key])
+    try:
+        found = next(_iter_files(root), None) is not None
+    except Exception:
+        found = False
+    if cache is not None:
+        cache[key] = found
+    return found
+
+
+def _collect_leaf_lesson_dirs(root: pathlib.Path, cache: dict[str, object] | None = None) -> list[pathlib.Path]:
+    """Leaf directories (the first level that holds files) under root, in lesson order.
+
+    `cache` is owned by one import run and keyed by path, so a subtree reached again
+    (e.g. after module_dir normalization) is walked only once.
+    """
 
+    key = f"leaf:{root}"
+    if cache is not None and key in cache:
+        return list(cache[key])  # type: ignore[arg-type]
 
-def _collect_leaf_lesson_dirs(root: pathlib.Path) -> list[pathlib.Path]:
     out: list[pathlib.Path] = []
     try:
-        direct_files = [p for p in root.iterdir() if p.is_file() and not _should_ignore_file(p)]
-        direct_dirs = [p for p in root.iterdir() if p.is_dir() and p.name not in {"_module", "__MACOSX"}]
+        direct_files, direct_dirs = _scan_dir(root)
+        direct_dirs = [p for p in direct_dirs if p.name != "_module"]
     except Exception:
         return out
 
     if direct_files:
-        return [root]
+        out = [root]
+    else:
+        for d in sorted(direct_dirs, key=lambda x: _parse_order(x.name, 999)):
+            if not _has_any_lesson_content(d, cache):
+                continue
+            out.extend(_collect_leaf_lesson_dirs(d, cache))
 
-    for d in sorted(direct_dirs, key=lambda x: _parse_order(x.name, 999)):
-        if not _has_any_lesson_content(d):
-            continue
-        out.extend(_collect_leaf_lesson_dirs(d))
+    if cache is not None:
+        cache[key] = list(out)
     return out
 
 
 def _clean_line(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "").strip()).strip()
+    return _RE_WS.sub(" ", (s or "").strip()).strip()
+
+
+def _is_list_item(x: str) -> bool:
+    return bool(_RE_LIST_ITEM.match(x) or x.startswith("•"))
 
 
 def _normalize_text_to_markdown(text: str) -> str:
-    raw = str(text or "").replace("\r\n", "\n").replace("\r", "\n")
+    raw = str(text or "")
+    if "\r" in raw:
+        raw = raw.replace("\r\n", "\n").replace("\r", "\n")
     if not raw.strip():
         return ""
 
-    raw = raw.replace("\u00a0", " ")
-    raw = re.sub(r"[ \t]+", " ", raw)
+    raw = _RE_HSPACE.sub(" ", raw.translate(_NBSP_TO_SPACE))
 
     src_lines = raw.split("\n")
     lines: list[str] = []
@@ -201,113 +374,343 @@ def _normalize_text_to_markdown(text: str) -> str:
             prev_empty = True
             continue
 
-        if s.startswith("•"):
-            s = "- " + s[1:].strip()
-        s = re.sub(r"^\*\s+", "- ", s)
+        if s[0] in "•*":
+            s = _RE_BULLET.sub("- ", s, count=1)
 
         lines.append(s)
         prev_empty = False
 
+    # Paragraphs are accumulated as fragments and joined once on flush, so wrapped lines are
+    # not re-copied on every merge. Only the paragraph head (list-item check) and its last two
+    # characters (hyphen/wrap checks) are tracked while building.
     merged: list[str] = []
-    i = 0
-    while i < len(lines):
-        cur = lines[i]
+    para: list[str] = []
+    head = ""
+    tail = ""
+    plen = 0
+
+    def flush() -> None:
+        if para:
+            merged.append("".join(para))
+            para.clear()
+
+    for cur in lines:
         if cur == "":
-            if merged and merged[-1] != "":
+            if para:
+                flush()
                 merged.append("")
-            i += 1
             continue
 
-        def is_list_item(x: str) -> bool:
-            return bool(
-                re.match(r"^(?:-\s+|\d{1,3}[.)]\s+)", x)
-                or x.startswith("•")
-            )
-
-        if merged and merged[-1] != "":
-            prev = merged[-1]
-            if prev.endswith("-") and not prev.endswith(" -"):
-                merged[-1] = prev[:-1] + cur
-                i += 1
+        if para:
+            if tail.endswith("-") and not tail.endswith(" -"):
+                para[-1] = para[-1][:-1]
+                para.append(cur)
+                tail = (tail[:-1] + cur)[-2:]
+                if plen <= 8:
+                    head = "".join(para)[:8]
+                plen += len(cur) - 1
                 continue
 
-            prev_is_list = is_list_item(prev)
-            cur_is_list = is_list_item(cur)
-            if (not prev_is_list) and (not cur_is_list):
-                prev_end = prev[-1] if prev else ""
-                cur_start = cur[0] if cur else ""
-                should_wrap = prev_end not in ".?!:;" and cur_start.islower()
-                if should_wrap:
-                    merged[-1] = prev + " " + cur
-                    i += 1
+            if (not _is_list_item(head)) and (not _is_list_item(cur)):
+                if tail[-1] not in ".?!:;" and cur[0].islower():
+                    para.append(" " + cur)
+                    tail = (tail + " " + cur)[-2:]
+                    if plen < 8:
+                        head = "".join(para)[:8]
+                    plen += len(cur) + 1
                     continue
 
-        merged.append(cur)
-        i += 1
-
-    out = "\n".join(merged)
-    out = re.sub(r"\n{3,}", "\n\n", out).strip()
-    return out
+            flush()
+
+        para.append(cur)
+        head = cur[:8]
+        tail = cur[-2:]
+        plen = len(cur)
+
+    flush()
+    # Lines never contain blank runs here, so joining already yields at most one empty line
+    # and the old collapse-newlines pass is unnecessary.
+    return "\n".join(merged).strip()
+
+
+# Theory text is stored as Submodule.content and sent to the LLM, so each file's extraction
+# is capped; real lessons stay far below this, it only stops oversized inputs early.
+_THEORY_MAX_CHARS = 600_000
+_THEORY_FILE_MAX_CHARS = _THEORY_MAX_CHARS // 3
+
+
+def _clip_text(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    # Prefer ending on a paragraph boundary over cutting a sentence in half.
+    cut = text.rfind("\n\n", 0, max_chars)
+    return text[: cut if cut > 0 else max_chars].strip()
+
+
+def _docx_xml_to_text_stream(f, max_chars: int = _THEORY_FILE_MAX_CHARS) -> str:
+    # Streams w:t text and ends a line per w:p; finished paragraphs are cleared to bound memory.
+    # Tags are matched by local name so both transitional and strict OOXML namespaces work.
+    parts: list[str] = []
+    size = 0
+    for _, elem in ElementTree.iterparse(f, events=("end",)):
+        tag = elem.tag
+        if tag.endswith("}t"):
+            if elem.text:
+                parts.append(elem.text)
+                size += len(elem.text)
+        elif tag.endswith("}p"):
+            parts.append("\n")
+            elem.clear()
+            if size > max_chars:
+                break
+    return "".join(parts)
 
 
-def _docx_to_text(path: pathlib.Path) -> str:
+def _docx_to_text(path: pathlib.Path, max_chars: int = _THEORY_FILE_MAX_CHARS) -> str:
     try:
         with zipfile.ZipFile(path, "r") as z:
-            xml = z.read("word/document.xml").decode("utf-8", errors="ignore")
-        xml = re.sub(r"</w:p>", "\n", xml)
-        xml = re.sub(r"<[^>]+>", "", xml)
-        xml = re.sub(r"\n{3,}", "\n\n", xml)
-        return _normalize_text_to_markdown(xml)
+            try:
+                with z.open("word/document.xml") as f:
+                    return _clip_text(_normalize_text_to_markdown(_docx_xml_to_text_stream(f, max_chars)), max_chars)
+            except ElementTree.ParseError:
+                # Malformed XML: fall back to tag stripping.
+                xml = z.read("word/document.xml").decode("utf-8", errors="ignore")
+        xml = _RE_XML_P.sub("\n", xml)
+        xml = _RE_XML_TAG.sub("", xml)
+        xml = _RE_BLANK3.sub("\n\n", xml)
+        return _clip_text(_normalize_text_to_markdown(xml), max_chars)
     except Exception:
         return ""
 
 
-def _pdf_to_text(path: pathlib.Path) -> str:
+_PDF_MAX_PAGES = 30
+# Scanned/image-only PDFs yield no text: give up if the first pages are all empty, and don't
+# parse huge files at all. The lesson then gets the markdown fallback.
+_PDF_PROBE_PAGES = 3
+_PDF_MAX_PARSE_BYTES = 50 * 1024 * 1024
+
+
+def _fitz_to_text(fitz, path: pathlib.Path, max_chars: int) -> str:
+    # PyMuPDF does not support multithreading (not even one Document per thread) and holds the
+    # GIL while extracting, so pages are read sequentially; lessons already parse in parallel
+    # processes via _prefetch_theories.
+    doc = fitz.open(str(path))
+    try:
+        parts: list[str] = []
+        size = 0
+        for i in range(min(_PDF_MAX_PAGES, int(doc.page_count or 0))):
+            t = _normalize_text_to_markdown(doc.load_page(i).get_text("text") or "")
+            if t:
+                parts.append(t)
+                size += len(t)
+                if size > max_chars:
+                    break
+            elif i + 1 >= _PDF_PROBE_PAGES and not parts:
+                break
+        return _clip_text("\n\n".join(parts).strip(), max_chars)
+    finally:
+        doc.close()
+
+
+def _pdfium_to_text(pdfium, path: pathlib.Path, max_chars: int) -> str:
+    doc = pdfium.PdfDocument(str(path))
+    try:
+        parts: list[str] = []
+        size = 0
+        for i in range(min(_PDF_MAX_PAGES, len(doc))):
+            page = doc[i]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    t = _normalize_text_to_markdown(textpage.get_text_range() or "")
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+            if t:
+                parts.append(t)
+                size += len(t)
+                if size > max_chars:
+                    break
+            elif i + 1 >= _PDF_PROBE_PAGES and not parts:
+                break
+        return _clip_text("\n\n".join(parts).strip(), max_chars)
+    finally:
+        doc.close()
+
+
+def _pdf_to_text(path: pathlib.Path, max_chars: int = _THEORY_FILE_MAX_CHARS) -> str:
+    try:
+        if path.stat().st_size > _PDF_MAX_PARSE_BYTES:
+            return ""
+    except OSError:
+        return ""
+
+    # PyMuPDF is an optional, much faster backend; pypdf stays as the fallback.
+    try:
+        import fitz  # type: ignore
+    except Exception:
+        fitz = None
+
+    if fitz is not None:
+        try:
+            return _fitz_to_text(fitz, path, max_chars)
+        except Exception:
+            pass
+
+    # pypdfium2 (PDFium, permissively licensed) is the next native option. PDFium is not
+    # thread-safe, so pages are read sequentially.
+    try:
+        import pypdfium2 as pdfium  # type: ignore
+    except Exception:
+        pdfium = None
+
+    if pdfium is not None:
+        try:
+            return _pdfium_to_text(pdfium, path, max_chars)
+        except Exception:
+            pass
+
+    # pypdf is pure Python (GIL-bound) and a PdfReader shares one stream, so it stays sequential.
     try:
         from pypdf import PdfReader  # type: ignore
 
         reader = PdfReader(str(path))
         parts: list[str] = []
-        for page in reader.pages[:30]:
+        size = 0
+        for n, page in enumerate(reader.pages[:_PDF_MAX_PAGES], start=1):
             t = page.extract_text() or ""
             t = _normalize_text_to_markdown(t)
             if t:
                 parts.append(t)
-        return "\n\n".join(parts).strip()
+                size += len(t)
+                if size > max_chars:
+                    break
+            elif n >= _PDF_PROBE_PAGES and not parts:
+                break
+        return _clip_text("\n\n".join(parts).strip(), max_chars)
     except Exception:
         return ""
 
 
-def _read_text(path: pathlib.Path) -> str:
+def _read_text(path: pathlib.Path, max_chars: int = _THEORY_FILE_MAX_CHARS) -> str:
+    # Result is final markdown: each parser normalizes exactly once (PDF per page), .md is
+    # returned as-is, and callers must not run _normalize_text_to_markdown on it again.
     ext = path.suffix.lower()
     if ext in {".txt", ".md"}:
         try:
-            txt = path.read_text(encoding="utf-8", errors="ignore")
+            # Read one char past the budget so only oversized files get clipped.
+            with path.open("r", encoding="utf-8", errors="ignore") as f:
+                txt = f.read(max_chars + 1)
             if ext == ".md":
-                return txt.strip()
-            return _normalize_text_to_markdown(txt)
+                return _clip_text(txt.strip(), max_chars)
+            return _clip_text(_normalize_text_to_markdown(txt), max_chars)
         except Exception:
             return ""
     if ext == ".docx":
-        return _docx_to_text(path)
+        return _docx_to_text(path, max_chars)
     if ext == ".pdf":
-        return _pdf_to_text(path)
+        return _pdf_to_text(path, max_chars)
     return ""
 
 
-def _theory_from_files(files: list[pathlib.Path]) -> str:
+_TEXT_CACHE_TTL_SECONDS = 86400 * 30
+_TEXT_CACHE_MAX_FILE_BYTES = 25 * 1024 * 1024
+# Bump whenever an extractor backend or _normalize_text_to_markdown changes output.
+_TEXT_CACHE_VERSION = 1
+# Plain-text theory is cheaper to re-read from disk than to round-trip through Redis.
+_TEXT_CACHE_EXTS = frozenset({".pdf", ".docx"})
+
+
+def _file_digest(path: pathlib.Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cached_read_text(path: pathlib.Path, max_chars: int = _THEORY_FILE_MAX_CHARS) -> str:
+    # Parsed theory text keyed by file content, so re-imports and duplicated files skip parsing.
+    ext = path.suffix.lower()
+    if ext not in _TEXT_CACHE_EXTS:
+        return _read_text(path, max_chars)
+    try:
+        if path.stat().st_size > _TEXT_CACHE_MAX_FILE_BYTES:
+            return _read_text(path, max_chars)
+        # The parser depends on the extension and the budget, so both are part of the key.
+        key = f"mi:text:v{_TEXT_CACHE_VERSION}:{ext.lstrip('.')}:{max_chars}:{_file_digest(path)}"
+        r = get_redis()
+        cached = r.get(key)
+    except Exception:
+        return _read_text(path, max_chars)
+    if cached is not None:
+        return str(cached)
+
+    text = _read_text(path, max_chars)
+    try:
+        r.setex(key, _TEXT_CACHE_TTL_SECONDS, text)
+    except Exception:
+        pass
+    return text
+
+
+def _theory_from_files(files: list[pathlib.Path], total_budget: int = _THEORY_MAX_CHARS) -> str:
     preferred: list[pathlib.Path] = []
     for ext in (".docx", ".pdf", ".txt", ".md"):
         preferred.extend([p for p in files if p.suffix.lower() == ext])
 
     chunks: list[str] = []
     for p in preferred[:3]:
-        t = _read_text(p)
+        t = _cached_read_text(p, total_budget // 3)
         if t:
             chunks.append(t)
     return "\n\n".join(chunks).strip()
 
 
+def _lesson_theory_files(files: list[pathlib.Path]) -> list[pathlib.Path]:
+    return [p for p in dict.fromkeys(files) if _is_theory_file(p) and not _should_ignore_file(p)]
+
+
+_THEORY_PROCESS_WORKERS = max(1, min(8, os.cpu_count() or 1))
+# Spawned workers re-import the app, so the pool only pays off for modules with several theory lessons.
+_THEORY_PROCESS_MIN_LESSONS = 4
+
+
+def _prefetch_theories(theory_files: dict[int, list[pathlib.Path]]) -> dict[int, str]:
+    """Parse the theory files of all lessons up front in a process pool.
+
+    Extraction is pure CPU under the GIL, so separate processes scale it across cores.
+    Workers are spawned rather than forked because the job already runs threads (uploads,
+    heartbeats). Lessons missing from the result (small modules, worker errors) are parsed
+    inline by the caller.
+    """
+
+    jobs = {i: fl for i, fl in theory_files.items() if fl}
+    if _THEORY_PROCESS_WORKERS <= 1 or len(jobs) < _THEORY_PROCESS_MIN_LESSONS:
+        return {}
+
+    _set_job_detail(f"theory: {len(jobs)} lessons")
+    out: dict[int, str] = {}
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(_THEORY_PROCESS_WORKERS, len(jobs)),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as ppe:
+            futs = {i: ppe.submit(_theory_from_files, fl) for i, fl in jobs.items()}
+            for i, fut in futs.items():
+                try:
+                    out[i] = fut.result()
+                except Exception as e:
+                    log.warning("module_importer: theory prefetch failed for lesson %s: %s", i, e)
+    except Exception as e:
+        log.warning("module_importer: theory prefetch pool failed: %s", e)
+    return out
+
+
 def _is_theory_file(p: pathlib.Path) -> bool:
     return p.suffix.lower() in {".docx", ".pdf", ".txt", ".md"}
 
@@ -353,19 +756,132 @@ def _is_previewable_lesson_asset(p: pathlib.Path) -> bool:
     }
 
 
-def _upload_file(*, s3, object_key: str, file_path: pathlib.Path) -> tuple[str | None, int | None]:
-    ct = mimetypes.guess_type(str(file_path))[0] or "application/octet-stream"
+_UPLOAD_WORKERS = 8
+_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+# Files already upload _UPLOAD_WORKERS at a time, so per-file part concurrency is sized to keep
+# workers * parts within the S3 client's connection pool (S3_MAX_POOL_CONNECTIONS).
+_UPLOAD_PART_CONCURRENCY = max(1, min(8, int(settings.s3_max_pool_connections or 0) // _UPLOAD_WORKERS))
+_UPLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=_MULTIPART_THRESHOLD,
+    multipart_chunksize=_MULTIPART_THRESHOLD,
+    max_concurrency=_UPLOAD_PART_CONCURRENCY,
+    use_threads=True,
+)
+
+
+# Fast path for the extensions imports usually carry; anything else falls back to mimetypes so
+# less common media still gets an image/video/audio type the lesson page can preview inline.
+_EXT_MIME: dict[str, str] = {
+    ".txt": "text/plain",
+    ".md": "text/markdown",
+    ".csv": "text/csv",
+    ".pdf": "application/pdf",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".gif": "image/gif",
+    ".bmp": "image/bmp",
+    ".tif": "image/tiff",
+    ".tiff": "image/tiff",
+    ".heic": "image/heic",
+    ".svg": "image/svg+xml",
+    ".mp4": "video/mp4",
+    ".webm": "video/webm",
+    ".mov": "video/quicktime",
+    ".mkv": "video/x-matroska",
+    ".m4v": "video/mp4",
+    ".avi": "video/x-msvideo",
+    ".mpeg": "video/mpeg",
+    ".mpg": "video/mpeg",
+    ".3gp": "video/3gpp",
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/x-wav",
+    ".ogg": "audio/ogg",
+    ".m4a": "audio/mp4",
+    ".flac": "audio/flac",
+    ".aac": "audio/aac",
+    ".opus": "audio/ogg",
+    ".doc": "application/msword",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".ppt": "application/vnd.ms-powerpoint",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".xls": "application/vnd.ms-excel",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".zip": "application/zip",
+    ".json": "application/json",
+    ".html": "text/html",
+    ".rtf": "application/rtf",
+}
+
+
+def _content_type(file_path: pathlib.Path) -> str:
+    ct = _EXT_MIME.get(file_path.suffix.lower())
+    if ct is None:
+        ct = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+    return ct
+
+
+def _put_file(*, s3, object_key: str, file_path: pathlib.Path) -> tuple[str | None, int | None]:
+    ct = _content_type(file_path)
+    size = int(file_path.stat().st_size)
+    if size >= _MULTIPART_THRESHOLD:
+        # Multipart with parallel parts read straight from disk, so memory stays at
+        # ~chunksize * concurrency; a failed part is retried alone instead of the whole file.
+        s3.upload_file(
+            Filename=str(file_path),
+            Bucket=settings.s3_bucket,
+            Key=object_key,
+            ExtraArgs={"ContentType": ct},
+            Config=_UPLOAD_TRANSFER_CONFIG,
+        )
+        return ct, size
     with file_path.open("rb") as f:
-        s3.put_object(Bucket=settings.s3_bucket, Key=object_key, Body=f, ContentType=ct)
-    _track_uploaded_key(object_key)
-    size = int(file_path.stat().st_size) if file_path.exists() else None
+        # Size is already known from the stat above: a fixed-length body lets botocore skip
+        # seeking the file to measure it, and the stat is reused for the returned size.
+        s3.put_object(Bucket=settings.s3_bucket, Key=object_key, Body=f, ContentLength=size, ContentType=ct)
     return ct, size
 
 
+def _start_uploads(*, pool: ThreadPoolExecutor, s3, items: list[tuple[str, pathlib.Path]]) -> list[Future]:
+    """Submit (object_key, path) uploads to the import's pool and return their futures.
+
+    Keys are tracked here, up front and on the job thread (get_current_job() is thread-local),
+    so cleanup also covers uploads still in flight if the import fails before they are collected.
+    """
+
+    futs: list[Future] = []
+    for k, fp in items:
+        _track_uploaded_key(k)
+        futs.append(pool.submit(_put_file, s3=s3, object_key=k, file_path=fp))
+    return futs
+
+
+def _finish_uploads(futs: list[Future]) -> list[tuple[str | None, int | None]]:
+    # Wait for every upload before raising, so no PUT is left running unobserved.
+    results: list[tuple[str | None, int | None]] = []
+    first_err: BaseException | None = None
+    for fut in futs:
+        try:
+            results.append(fut.result())
+        except BaseException as e:
+            if first_err is None:
+                first_err = e
+            results.append((None, None))
+    if first_err is not None:
+        raise first_err
+    return results
+
+
 def _upload_markdown_text(*, s3, object_key: str, text_value: str) -> None:
     data = (text_value or "").encode("utf-8")
-    s3.put_object(Bucket=settings.s3_bucket, Key=object_key, Body=data, ContentType="text/markdown; charset=utf-8")
-    _track_uploaded_key(object_key)
+    s3.put_object(
+        Bucket=settings.s3_bucket,
+        Key=object_key,
+        Body=data,
+        ContentLength=len(data),
+        ContentType="text/markdown; charset=utf-8",
+    )
 
 
 def _lesson_markdown_fallback(*, module_title: str, lesson_title: str, files: list[pathlib.Path]) -> str:
@@ -386,6 +902,34 @@ def import_module_from_dir(
     report_out: dict | None = None,
     generate_questions: bool = True,
     module_id_override: str | None = None,
+) -> uuid.UUID:
+    # One upload pool per import: asset PUTs run in the background while the lesson's
+    # theory, quiz and DB rows are produced on this thread.
+    try:
+        with ThreadPoolExecutor(max_workers=_UPLOAD_WORKERS) as upload_pool:
+            return _import_module_from_dir(
+                db=db,
+                module_dir=module_dir,
+                title_override=title_override,
+                report_out=report_out,
+                generate_questions=generate_questions,
+                module_id_override=module_id_override,
+                upload_pool=upload_pool,
+            )
+    finally:
+        # Uploaded keys must reach Redis even on failure: cancel/cleanup reads them from job meta.
+        _flush_job_meta(force=True)
+
+
+def _import_module_from_dir(
+    *,
+    db: Session,
+    module_dir: pathlib.Path,
+    title_override: str | None,
+    report_out: dict | None,
+    generate_questions: bool,
+    module_id_override: str | None,
+    upload_pool: ThreadPoolExecutor,
 ) -> uuid.UUID:
     ensure_bucket_exists()
     s3 = get_s3_client()
@@ -428,6 +972,9 @@ def import_module_from_dir(
         report.setdefault("ollama_enabled", bool(settings.ollama_enabled))
         report.setdefault("ollama_used", False)
 
+    # A module created in this call cannot own any assets yet, so the existing-asset lookup is skipped.
+    fresh_module = m is None
+
     if m is None:
         # Product rule: final exam questions are generated at runtime on /quizzes/{id}/start.
         # We still keep a stable final_quiz_id so the UI/routes can reference the final exam.
@@ -450,12 +997,22 @@ def import_module_from_dir(
 
     log.info("module_importer: created module id=%s title=%s", str(m.id), module_title)
 
+    # Asset rows already under this module's key prefix, fetched once for the whole import
+    # instead of per lesson/asset; new rows are added as they are created.
+    known_assets: dict[str, ContentAsset] = {}
+    if not fresh_module:
+        known_assets = {
+            a.object_key: a
+            for a in db.scalars(
+                select(ContentAsset).where(ContentAsset.object_key.startswith(f"modules/{m.id}/", autoescape=True))
+            )
+        }
+
     # Normalize module_dir if the ZIP has an extra nesting level.
     for _ in range(2):
-        lesson_dirs_probe = [d for d in module_dir.iterdir() if d.is_dir() and d.name not in {"_module", "__MACOSX"}]
-        if lesson_dirs_probe:
+        _, nested = _scan_dir(module_dir)
+        if any(d.name != "_module" for d in nested):
             break
-        nested = [d for d in module_dir.iterdir() if d.is_dir() and d.name not in {"__MACOSX"}]
         if len(nested) == 1:
             module_dir = nested[0]
             continue
@@ -463,17 +1020,30 @@ def import_module_from_dir(
 
     module_material_dir = module_dir / "_module"
     if module_material_dir.exists() and module_material_dir.is_dir():
+        material_items: list[tuple[str, pathlib.Path]] = []
         for fp in _list_files_recursive(module_material_dir):
             try:
                 rel = fp.relative_to(module_material_dir)
                 rel_name = str(rel.as_posix())
             except Exception:
                 rel_name = fp.name
-
-            _set_job_detail(f"material: {rel_name}")
+            material_items.append((rel_name, fp))
+
+        if material_items:
+            _set_job_detail(f"material: {len(material_items)} files")
+        uploads = _finish_uploads(
+            _start_uploads(
+                pool=upload_pool,
+                s3=s3,
+                items=[(f"modules/{m.id}/_module/{rel_name}", fp) for rel_name, fp in material_items],
+            )
+        )
+        # Nothing references these rows' ids, so they go in with the next flush as one batch.
+        material_assets: list[ContentAsset] = []
+        for (rel_name, _), (mime, size) in zip(material_items, uploads):
             object_key = f"modules/{m.id}/_module/{rel_name}"
-            mime, size = _upload_file(s3=s3, object_key=object_key, file_path=fp)
-
+            if object_key in known_assets:
+                continue
             asset = ContentAsset(
                 bucket=settings.s3_bucket,
                 object_key=object_key,
@@ -483,18 +1053,22 @@ def import_module_from_dir(
                 checksum_sha256=None,
                 created_by=None,
             )
-            db.add(asset)
-            db.flush()
-
-            if report is not None:
-                report["module_assets"] = int(report.get("module_assets") or 0) + 1
+            known_assets[object_key] = asset
+            material_assets.append(asset)
+        db.add_all(material_assets)
+        if report is not None:
+            report["module_assets"] = int(report.get("module_assets") or 0) + len(material_items)
 
-    lesson_candidates = [d for d in module_dir.iterdir() if d.is_dir() and d.name not in {"_module", "__MACOSX"}]
+    # Direct files/dirs of module_dir, listed once and reused for the lesson split below.
+    module_files, module_subdirs = _scan_dir(module_dir)
+    lesson_candidates = [d for d in module_subdirs if d.name != "_module"]
     if not lesson_candidates:
-        for d in sorted([p for p in module_dir.iterdir() if p.is_dir() and p.name not in {"_module", "__MACOSX"}]):
-            inner = [x for x in d.iterdir() if x.is_dir() and x.name not in {"_module", "__MACOSX"}]
+        for d in sorted(lesson_candidates):
+            d_files, d_dirs = _scan_dir(d)
+            inner = [x for x in d_dirs if x.name != "_module"]
             if inner:
                 module_dir = d
+                module_files = d_files
                 lesson_candidates = inner
                 break
 
@@ -508,7 +1082,7 @@ def import_module_from_dir(
         lesson_dirs = [module_dir]
 
     if root_as_lesson:
-        root_files = sorted([p for p in module_dir.iterdir() if p.is_file() and not _should_ignore_file(p)])
+        root_files = sorted(module_files)
         theory_files = [p for p in root_files if _is_theory_file(p)]
         if len(theory_files) > 1:
             theory_files = sorted(theory_files, key=lambda x: _parse_order(x.name, 999))
@@ -523,12 +1097,13 @@ def import_module_from_dir(
     else:
         # Mixed mode: module has lesson folders AND files in module root.
         # Treat root-level files as their own lesson(s) instead of dropping them.
-        root_files = sorted([p for p in module_dir.iterdir() if p.is_file() and not _should_ignore_file(p)])
+        root_files = sorted(module_files)
         root_theory_files = [p for p in root_files if _is_theory_file(p)]
 
         lesson_specs = []
         extra_assets = []
         nested_order = 0
+        walk_cache: dict[str, object] = {}
 
         if root_files:
             if len(root_theory_files) > 1:
@@ -548,18 +1123,18 @@ def import_module_from_dir(
                 lesson_specs.append((_parse_order(module_dir.name, 0), title0, root_files, module_dir))
 
         for i, ld in enumerate(lesson_dirs, start=1):
-            direct_files = sorted([p for p in ld.iterdir() if p.is_file() and not _should_ignore_file(p)])
+            direct_files = sorted(_scan_dir(ld)[0])
             if direct_files:
                 lesson_specs.append((_parse_order(ld.name, i), _guess_title(ld.name), direct_files, ld))
                 continue
 
-            leaf_dirs = [d for d in _collect_leaf_lesson_dirs(ld) if d != ld]
+            leaf_dirs = [d for d in _collect_leaf_lesson_dirs(ld, walk_cache) if d != ld]
             for leaf in leaf_dirs:
                 nested_order += 1
-                rel = " / ".join([_guess_title(p.name) for p in leaf.relative_to(ld).parts if str(p).strip()])
+                rel = " / ".join([_guess_title(p) for p in leaf.relative_to(ld).parts if str(p).strip()])
                 title2 = f"{_guess_title(ld.name)} / {rel}" if rel else _guess_title(ld.name)
+                # Already filtered by the walker.
                 files2 = _list_files_recursive(leaf)
-                files2 = [p for p in files2 if not _should_ignore_file(p)]
                 if not files2:
                     continue
                 parent_order = _parse_order(ld.name, i)
@@ -582,25 +1157,71 @@ def import_module_from_dir(
     for idx, (_, t, f, root) in enumerate(normalized_specs, start=1):
         renum.append((idx, t, f, root))
 
+    # Resolved once per import rather than re-probed for every lesson.
+    provider_order: list[str] = []
+    if generate_questions and (settings.ollama_enabled or settings.hf_router_enabled or settings.openrouter_enabled):
+        provider_order = choose_llm_provider_order_fast(ttl_seconds=300, use_cache=True)
+
+    prefetched_theory = _prefetch_theories(
+        {i: _lesson_theory_files(files) for i, (_, _, files, _) in enumerate(renum, start=1)}
+    )
+
+    # Lesson rows are pipelined so each lesson costs two flushes. Models declare no relationships,
+    # so the session cannot order INSERTs by FK; instead every flush only carries rows whose FK
+    # targets are already written. Ids are assigned client-side, so rows can reference each other
+    # before they are flushed. Lesson K's questions and new assets ride along with lesson K+1's
+    # Quiz flush, and its asset map rows (held outside the session until then) with the Submodule flush.
+    pending_asset_maps: list[SubmoduleAssetMap] = []
+
     for i, (order, title, files, lesson_root) in enumerate(renum, start=1):
         _set_job_detail(f"lesson {i}/{total_lessons}: {title}")
-        theory = _theory_from_files(files)
 
-        non_theory_files = [p for p in files if p.is_file() and not _is_theory_file(p)]
+        # If this module is flat (no lesson folders), attach non-theory assets to the first lesson.
+        files_for_assets = files
+        if root_as_lesson and i == 1 and extra_assets:
+            files_for_assets = list(files) + list(extra_assets)
+
+        # One pass over the lesson's files: classification, rel_name and sort key are computed
+        # once and shared by the theory, materials-only and asset steps below.
+        lesson_files = _scan_lesson_files(files_for_assets, lesson_root=lesson_root)
+        asset_items: list[tuple[str, pathlib.Path]] = [
+            (lf.rel_name, lf.path) for lf in sorted(lesson_files, key=lambda x: (x.sort_key, x.rel_name, x.path))
+        ]
+
+        # Asset uploads start now and overlap with theory parsing, quiz generation and the
+        # lesson's DB rows; they are collected right before the asset rows are written.
+        asset_keys = [f"modules/{m.id}/{order:02d}/{rel_name}" for rel_name, _ in asset_items]
+        upload_futs = _start_uploads(
+            pool=upload_pool,
+            s3=s3,
+            items=[(k, fp) for k, (_, fp) in zip(asset_keys, asset_items)],
+        )
+
+        own_files = set(files)
+        if i in prefetched_theory:
+            theory = prefetched_theory[i]
+        else:
+            theory = _theory_from_files(_lesson_theory_files(files))
+
+        non_theory_files = [lf.path for lf in lesson_files if not lf.is_theory and lf.path in own_files]
         has_previewable_assets = any(_is_previewable_lesson_asset(p) for p in non_theory_files)
         materials_only = (not (theory or "").strip()) and bool(has_previewable_assets)
 
         if not (theory or "").strip():
             theory = _lesson_markdown_fallback(module_title=module_title, lesson_title=title, files=files)
 
+        # theory.md goes through the same pool so its PUT overlaps with the quiz rows and question
+        # generation below; it is collected together with the lesson's asset uploads.
         content_key = f"modules/{m.id}/{order:02d}/theory.md"
-        _upload_markdown_text(s3=s3, object_key=content_key, text_value=theory)
+        _track_uploaded_key(content_key)
+        theory_fut = upload_pool.submit(_upload_markdown_text, s3=s3, object_key=content_key, text_value=theory)
 
-        qz = Quiz(type=QuizType.submodule, pass_threshold=70, time_limit=None, attempts_limit=None)
+        qz = Quiz(id=uuid.uuid4(), type=QuizType.submodule, pass_threshold=70, time_limit=None, attempts_limit=None)
         db.add(qz)
         db.flush()
 
         s = Submodule(
+            id=uuid.uuid4(),
             module_id=m.id,
             title=title,
             content=theory,
@@ -609,6 +1230,8 @@ def import_module_from_dir(
             requires_quiz=(not materials_only),
         )
         db.add(s)
+        db.add_all(pending_asset_maps)
+        pending_asset_maps = []
         db.flush()
 
         if report is not None:
@@ -618,8 +1241,7 @@ def import_module_from_dir(
         # Phase 2: if generate_questions=True (background regen), call AI/Heuristic.
         if generate_questions:
             qs = []
-            if settings.ollama_enabled or settings.hf_router_enabled or settings.openrouter_enabled:
-                provider_order = choose_llm_provider_order_fast(ttl_seconds=300, use_cache=False)
+            if provider_order:
                 qs = generate_quiz_questions_ai(
                     title=title,
                     text=theory or "",
@@ -630,10 +1252,11 @@ def import_module_from_dir(
                     provider_order=provider_order,
                 )
                 if qs:
+                    questions: list[Question] = []
                     for qi, q in enumerate(qs, start=1):
                         raw_type = str(getattr(q, "qtype", None) or getattr(q, "type", "") or "").strip().lower()
                         qtype = "multi" if raw_type == "multi" else "single"
-                        db.add(
+                        questions.append(
                             Question(
                                 quiz_id=qz.id,
                                 type=QuestionType.single if qtype == "single" else QuestionType.multi,
@@ -645,6 +1268,7 @@ def import_module_from_dir(
                                 variant_group=None,
                             )
                         )
+                    db.add_all(questions)
                     if report is not None:
                         report["questions_ai"] = int(report.get("questions_ai") or 0) + len(qs)
                         report["questions_total"] = int(report.get("questions_total") or 0) + len(qs)
@@ -658,8 +1282,8 @@ def import_module_from_dir(
                     target=5,
                 )
                 if generated:
-                    for qi, mcq in enumerate(generated, start=1):
-                        db.add(
+                    db.add_all(
+                        [
                             Question(
                                 quiz_id=qz.id,
                                 type=QuestionType.single if mcq.qtype == "single" else QuestionType.multi,
@@ -670,7 +1294,9 @@ def import_module_from_dir(
                                 concept_tag=f"needs_regen:import:{m.id}:{order}:{qi}",
                                 variant_group=None,
                             )
-                        )
+                            for qi, mcq in enumerate(generated, start=1)
+                        ]
+                    )
                     if report is not None:
                         report["questions_heur"] = int(report.get("questions_heur") or 0) + len(generated)
                         report["questions_total"] = int(report.get("questions_total") or 0) + len(generated)
@@ -697,38 +1323,15 @@ def import_module_from_dir(
                     report["needs_regen"] = int(report.get("needs_regen") or 0) + 1
                     report["questions_total"] = int(report.get("questions_total") or 0) + 1
 
-        per_asset_order = 1
-        # If this module is flat (no lesson folders), attach non-theory assets to the first lesson.
-        files_for_assets = files
-        if root_as_lesson and i == 1 and extra_assets:
-            files_for_assets = list(files) + list(extra_assets)
-
-        seen_asset_paths: set[pathlib.Path] = set()
-        for fp in files_for_assets:
-            try:
-                if not fp.exists() or not fp.is_file():
-                    continue
-            except Exception:
-                continue
-            if _should_ignore_file(fp):
-                continue
-            seen_asset_paths.add(fp)
-
-        for fp in sorted(seen_asset_paths, key=lambda x: _asset_sort_key(fp=x, lesson_root=lesson_root)):
-            rel_name = fp.name
-            try:
-                rel = fp.relative_to(lesson_root)
-                rel_name = str(rel.as_posix())
-            except Exception:
-                rel_name = fp.name
-
-            _set_job_detail(f"asset: {rel_name}")
-            object_key = f"modules/{m.id}/{order:02d}/{rel_name}"
-            mime, size = _upload_file(s3=s3, object_key=object_key, file_path=fp)
+        uploads = _finish_uploads(upload_futs + [theory_fut])[:-1]
 
-            asset = db.scalar(select(ContentAsset).where(ContentAsset.object_key == object_key))
+        lesson_assets: list[ContentAsset] = []
+        new_assets: list[ContentAsset] = []
+        for (rel_name, _), object_key, (mime, size) in zip(asset_items, asset_keys, uploads):
+            asset = known_assets.get(object_key)
             if asset is None:
                 asset = ContentAsset(
+                    id=uuid.uuid4(),
                     bucket=settings.s3_bucket,
                     object_key=object_key,
                     original_filename=rel_name,
@@ -737,20 +1340,23 @@ def import_module_from_dir(
                     checksum_sha256=None,
                     created_by=None,
                 )
-                db.add(asset)
-                db.flush()
-
-            db.add(
-                SubmoduleAssetMap(
-                    submodule_id=s.id,
-                    asset_id=asset.id,
-                    order=per_asset_order,
-                )
-            )
-            per_asset_order += 1
+                known_assets[object_key] = asset
+                new_assets.append(asset)
+            lesson_assets.append(asset)
+
+        db.add_all(new_assets)
+        pending_asset_maps = [
+            SubmoduleAssetMap(submodule_id=s.id, asset_id=asset.id, order=per_asset_order)
+            for per_asset_order, asset in enumerate(lesson_assets, start=1)
+        ]
+        if report is not None:
+            report["lesson_assets"] = int(report.get("lesson_assets") or 0) + len(lesson_assets)
 
-            if report is not None:
-                report["lesson_assets"] = int(report.get("lesson_assets") or 0) + 1
+    if pending_asset_maps:
+        # The last lesson's assets must be written before its map rows.
+        db.flush()
+        db.add_all(pending_asset_maps)
 
+    _flush_job_meta(force=True)
     db.commit()
     return m.id
@@ -8,11 +8,11 @@ import json
 
 from app.models.module import Module, Submodule
 from app.models.attempt import QuizAttempt
-from app.models.audit import LearningEvent, LearningEventType
+from app.models.audit import LearningEvent
 from app.models.user import User
 
-from app.services.learning import LearningService
-from app.services.storage import s3_prefix_has_objects
+from app.services.learning import _IS_SUBMODULE_OPENED, _MAY_BE_READ, LearningService
+from app.services.storage import s3_prefixes_have_objects
 
 class ModuleService:
     def __init__(self, db: Session):
@@ -28,7 +28,8 @@ class ModuleService:
 
         # Storage consistency: if a module has no objects in S3 under modules/<id>/,
         # it must not appear in the app.
-        modules = [m for m in modules if s3_prefix_has_objects(prefix=f"modules/{m.id}/")]
+        has_objects = s3_prefixes_have_objects(prefixes=[f"modules/{m.id}/" for m in modules])
+        modules = [m for m in modules if has_objects.get(f"modules/{m.id}/")]
         
         if not modules:
             return []
@@ -87,8 +88,9 @@ class ModuleService:
             .join(LearningEvent, Submodule.id == LearningEvent.ref_id)
             .where(
                 LearningEvent.user_id == user_id,
-                LearningEvent.type == LearningEventType.submodule_opened,
-                LearningEvent.meta.is_not(None),
+                _IS_SUBMODULE_OPENED,
+                # Prefilter in SQL; the exact legacy/JSON check still runs below.
+                _MAY_BE_READ,
                 Submodule.module_id.in_(module_ids)
             )
         ).all()
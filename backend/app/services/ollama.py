@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+import logging
 import re
 from typing import Any
 
@@ -10,6 +11,9 @@ from pydantic import BaseModel, ValidationError
 from app.core.config import settings
 
 
+log = logging.getLogger(__name__)
+
+
 class OllamaQuestion(BaseModel):
     type: str  # single|multi
     prompt: str
@@ -121,7 +125,7 @@ def generate_quiz_questions_ollama(
                         pass
                     continue
             if last_exc is not None:
-                print(f"ollama: chat failed (fallback) err={type(last_exc).__name__}: {last_exc}", flush=True)
+                log.warning("ollama: chat failed (fallback) err=%s: %s", type(last_exc).__name__, last_exc)
                 status = None
                 body_snip = None
                 try:
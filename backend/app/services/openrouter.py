@@ -11,6 +11,16 @@ from app.core.config import settings
 from app.core.redis_client import get_redis
 
 
+_RUNTIME_KEYS = (
+    "openrouter_enabled",
+    "openrouter_api_key",
+    "openrouter_model",
+    "openrouter_base_url",
+    "openrouter_http_referer",
+    "openrouter_app_title",
+)
+
+
 class OpenRouterQuestion(BaseModel):
     type: str
     prompt: str
@@ -166,6 +176,74 @@ def _extract_json(text: str) -> dict[str, Any] | None:
         return None
 
 
+def _normalize_quiz_response(obj: object) -> OpenRouterQuizResponse | None:
+    # Be forgiving: OpenRouter models may return slightly different schemas.
+    # Try to normalize common shapes into {"questions": [{type,prompt,correct_answer,explanation}]}.
+    raw_items = None
+    for k in ("questions", "items", "data", "result"):
+        v = obj.get(k) if isinstance(obj, dict) else None
+        if isinstance(v, list):
+            raw_items = v
+            break
+
+    if raw_items is None and isinstance(obj, dict):
+        # Sometimes the model returns a single question object.
+        if any(x in obj for x in ("prompt", "question")):
+            raw_items = [obj]
+
+    normalized: list[OpenRouterQuestion] = []
+    for it in raw_items or []:
+        if not isinstance(it, dict):
+            continue
+
+        base_prompt = (it.get("prompt") or it.get("question") or it.get("text") or it.get("q") or "")
+        opts = it.get("options")
+        if opts is None:
+            opts = it.get("choices")
+        if opts is None:
+            opts = it.get("variants")
+        if opts is None:
+            opts = it.get("answers")
+        prompt = str(base_prompt or "")
+        if opts is not None:
+            prompt = prompt.strip() + _format_options_for_prompt(opts)
+
+        correct_raw = (
+            it.get("correct_answer")
+            or it.get("answer")
+            or it.get("correct")
+            or it.get("correctOption")
+            or it.get("correct_option")
+            or it.get("correct_text")
+            or ""
+        )
+        correct_index = (
+            it.get("correct_index")
+            or it.get("correctIndex")
+            or it.get("correct_option_index")
+            or it.get("correctOptionIndex")
+            or it.get("answer_index")
+            or it.get("answerIndex")
+        )
+        correct_answer = _pick_correct_answer(correct_raw=correct_raw, correct_index=correct_index, options=opts)
+
+        cand = {
+            "type": (it.get("type") or it.get("qtype") or it.get("question_type") or "single"),
+            "prompt": prompt,
+            "correct_answer": correct_answer,
+            "explanation": (it.get("explanation") or it.get("rationale") or it.get("reason") or None),
+        }
+        try:
+            q = OpenRouterQuestion.model_validate(cand)
+        except Exception:
+            continue
+        normalized.append(q)
+
+    if not normalized:
+        return None
+    return OpenRouterQuizResponse(questions=normalized)
+
+
 def generate_quiz_questions_openrouter(
     *,
     title: str,
@@ -177,48 +255,28 @@ def generate_quiz_questions_openrouter(
     system_prompt: str | None = None,
     temperature: float | None = None,
     timeout_read_seconds: float | None = None,
+    timeout_connect_seconds: float | None = None,
+    max_output_tokens: int | None = None,
     repair_text: str | None = None,
 ) -> list[OpenRouterQuestion]:
+    # Runtime overrides, fetched in one round-trip (values are decoded str).
+    rt: dict[str, str] = {}
+    try:
+        vals = get_redis().hmget("runtime:llm", _RUNTIME_KEYS)
+        rt = {k: str(v).strip() for k, v in zip(_RUNTIME_KEYS, vals or ()) if v is not None}
+    except Exception:
+        rt = {}
+
     if not settings.openrouter_enabled:
         # Allow runtime enabling via Redis.
-        try:
-            r = get_redis()
-            enabled_raw = (r.hget("runtime:llm", "openrouter_enabled") or b"").decode("utf-8", errors="ignore")
-            if enabled_raw.strip().lower() not in {"1", "true", "yes", "on"}:
-                return []
-        except Exception:
+        if rt.get("openrouter_enabled", "").lower() not in {"1", "true", "yes", "on"}:
             return []
 
-    token = (settings.openrouter_api_key or "").strip()
-
-    # Runtime overrides.
-    runtime_model: str | None = None
-    runtime_base: str | None = None
-    runtime_ref: str | None = None
-    runtime_title: str | None = None
-    try:
-        r = get_redis()
-        rt = r.hget("runtime:llm", "openrouter_api_key")
-        if rt is not None:
-            token = (rt.decode("utf-8") if isinstance(rt, (bytes, bytearray)) else str(rt)).strip() or token
-
-        rm = r.hget("runtime:llm", "openrouter_model")
-        if rm is not None:
-            runtime_model = (rm.decode("utf-8") if isinstance(rm, (bytes, bytearray)) else str(rm)).strip() or None
-
-        rb = r.hget("runtime:llm", "openrouter_base_url")
-        if rb is not None:
-            runtime_base = (rb.decode("utf-8") if isinstance(rb, (bytes, bytearray)) else str(rb)).strip() or None
-
-        rr = r.hget("runtime:llm", "openrouter_http_referer")
-        if rr is not None:
-            runtime_ref = (rr.decode("utf-8") if isinstance(rr, (bytes, bytearray)) else str(rr)).strip() or None
-
-        rtt = r.hget("runtime:llm", "openrouter_app_title")
-        if rtt is not None:
-            runtime_title = (rtt.decode("utf-8") if isinstance(rtt, (bytes, bytearray)) else str(rtt)).strip() or None
-    except Exception:
-        pass
+    token = rt.get("openrouter_api_key") or (settings.openrouter_api_key or "").strip()
+    runtime_model = rt.get("openrouter_model") or None
+    runtime_base = rt.get("openrouter_base_url") or None
+    runtime_ref = rt.get("openrouter_http_referer") or None
+    runtime_title = rt.get("openrouter_app_title") or None
 
     if not token:
         if debug_out is not None:
@@ -287,6 +345,8 @@ def generate_quiz_questions_openrouter(
         ],
         "temperature": use_temp,
     }
+    if max_output_tokens is not None and int(max_output_tokens) > 0:
+        payload["max_tokens"] = int(max_output_tokens)
 
     if debug_out is not None:
         try:
@@ -304,6 +364,7 @@ def generate_quiz_questions_openrouter(
                     "model": str(use_model),
                     "temperature": float(use_temp),
                     "timeout_read_seconds": float(timeout_read_seconds) if timeout_read_seconds is not None else None,
+                    "max_tokens": payload.get("max_tokens"),
                     "system_prompt_snip": str(sys_prompt or "")[:1200],
                     "user_prompt_snip": str(user_msg or "")[:2400],
                     "repair": bool(repair_text and str(repair_text).strip()),
@@ -329,8 +390,13 @@ def generate_quiz_questions_openrouter(
 
     try:
         read_s = float(timeout_read_seconds) if timeout_read_seconds is not None else float(settings.openrouter_timeout_read)
+        connect_s = (
+            float(timeout_connect_seconds)
+            if timeout_connect_seconds is not None
+            else float(settings.openrouter_timeout_connect)
+        )
         timeout = httpx.Timeout(
-            connect=float(settings.openrouter_timeout_connect),
+            connect=connect_s,
             read=read_s,
             write=float(settings.openrouter_timeout_write),
             pool=3.0,
@@ -377,92 +443,42 @@ def generate_quiz_questions_openrouter(
     if debug_out is not None:
         # Keep a bounded raw snippet to aid diagnostics and repair.
         debug_out["raw"] = raw[:6000]
-    obj = _extract_json(raw)
-    if not obj:
-        _set_debug("invalid_json")
-        return []
+
+    parsed: OpenRouterQuizResponse | None = None
+    stripped = raw.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        # Well-formed replies (the common case) are decoded and validated in a
+        # single pydantic-core pass, without building an intermediate dict.
+        try:
+            parsed = OpenRouterQuizResponse.model_validate_json(stripped)
+        except ValidationError:
+            parsed = None
 
     if debug_out is not None:
         debug_out.setdefault("raw_snip", raw[:600])
-        try:
-            debug_out.setdefault("json_keys", list(obj.keys()))
-        except Exception:
-            pass
 
-    try:
-        parsed = OpenRouterQuizResponse.model_validate(obj)
-    except ValidationError:
-        # Be forgiving: OpenRouter models may return slightly different schemas.
-        # Try to normalize common shapes into {"questions": [{type,prompt,correct_answer,explanation}]}.
+    if parsed is None:
+        obj = _extract_json(raw)
+        if not obj:
+            _set_debug("invalid_json")
+            return []
+
+        if debug_out is not None:
+            try:
+                debug_out.setdefault("json_keys", list(obj.keys()))
+            except Exception:
+                pass
+
         try:
-            raw_items = None
-            for k in ("questions", "items", "data", "result"):
-                v = obj.get(k) if isinstance(obj, dict) else None
-                if isinstance(v, list):
-                    raw_items = v
-                    break
-
-            if raw_items is None and isinstance(obj, dict):
-                # Sometimes the model returns a single question object.
-                if any(x in obj for x in ("prompt", "question")):
-                    raw_items = [obj]
-
-            normalized: list[OpenRouterQuestion] = []
-            for it in raw_items or []:
-                if not isinstance(it, dict):
-                    continue
-
-                base_prompt = (it.get("prompt") or it.get("question") or it.get("text") or it.get("q") or "")
-                opts = it.get("options")
-                if opts is None:
-                    opts = it.get("choices")
-                if opts is None:
-                    opts = it.get("variants")
-                if opts is None:
-                    opts = it.get("answers")
-                prompt = str(base_prompt or "")
-                if opts is not None:
-                    prompt = prompt.strip() + _format_options_for_prompt(opts)
-
-                correct_raw = (
-                    it.get("correct_answer")
-                    or it.get("answer")
-                    or it.get("correct")
-                    or it.get("correctOption")
-                    or it.get("correct_option")
-                    or it.get("correct_text")
-                    or ""
-                )
-                correct_index = (
-                    it.get("correct_index")
-                    or it.get("correctIndex")
-                    or it.get("correct_option_index")
-                    or it.get("correctOptionIndex")
-                    or it.get("answer_index")
-                    or it.get("answerIndex")
-                )
-                correct_answer = _pick_correct_answer(correct_raw=correct_raw, correct_index=correct_index, options=opts)
-
-                cand = {
-                    "type": (it.get("type") or it.get("qtype") or it.get("question_type") or "single"),
-                    "prompt": prompt,
-                    "correct_answer": correct_answer,
-                    "explanation": (it.get("explanation") or it.get("rationale") or it.get("reason") or None),
-                }
-                try:
-                    q = OpenRouterQuestion.model_validate(cand)
-                except Exception:
-                    continue
-                normalized.append(q)
-
-            if normalized:
-                parsed = OpenRouterQuizResponse(questions=normalized)
-            else:
+            parsed = OpenRouterQuizResponse.model_validate(obj)
+        except ValidationError:
+            try:
+                parsed = _normalize_quiz_response(obj)
+            except Exception:
+                parsed = None
+            if parsed is None:
                 _set_debug("schema_validation_failed")
                 return []
-        except Exception:
-            _set_debug("schema_validation_failed")
-            return []
 
     out: list[OpenRouterQuestion] = []
     seen_prompts: set[str] = set()
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import boto3
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from botocore.client import Config
 from botocore.exceptions import ClientError
 
@@ -12,13 +14,32 @@ from app.core.redis_client import get_redis
 log = logging.getLogger(__name__)
 
 
+_clients: dict[str | None, object] = {}
+_clients_lock = threading.Lock()
+_bucket_ready = False
+
+
 def get_s3_client(*, endpoint_url: str | None = None):
     ep = (endpoint_url or "").strip() or None
     # For AWS S3, endpoint_url must be None.
     # For S3-compatible providers (MinIO/R2/YC), endpoint_url is required.
+    ep = ep or (str(getattr(settings, "s3_endpoint_url", "") or "").strip() or None)
+    # botocore clients are thread-safe: share one per endpoint so connection
+    # pools (and TLS sessions) survive across requests and jobs.
+    client = _clients.get(ep)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(ep)
+            if client is None:
+                client = _new_s3_client(ep)
+                _clients[ep] = client
+    return client
+
+
+def _new_s3_client(ep: str | None):
     return boto3.client(
         "s3",
-        endpoint_url=ep or (str(getattr(settings, "s3_endpoint_url", "") or "").strip() or None),
+        endpoint_url=ep,
         aws_access_key_id=settings.s3_access_key_id,
         aws_secret_access_key=settings.s3_secret_access_key,
         region_name=settings.s3_region_name,
@@ -82,6 +103,11 @@ def ensure_bucket_cors() -> None:
 
 
 def ensure_bucket_exists() -> None:
+    global _bucket_ready
+    # Once the bucket (and its CORS) has been confirmed, later calls in this
+    # process skip the head_bucket/put_bucket_cors round-trips.
+    if _bucket_ready:
+        return
     s3 = get_s3_client()
     try:
         s3.head_bucket(Bucket=settings.s3_bucket)
@@ -113,6 +139,8 @@ def ensure_bucket_exists() -> None:
             pass
         else:
             pass
+        return
+    _bucket_ready = True
 
 
 def s3_prefix_has_objects(*, prefix: str, cache_seconds: int = 60, bypass_cache: bool = False) -> bool:
@@ -153,6 +181,64 @@ def s3_prefix_has_objects(*, prefix: str, cache_seconds: int = 60, bypass_cache:
     return ok
 
 
+def s3_prefixes_have_objects(*, prefixes: list[str], cache_seconds: int = 60) -> dict[str, bool]:
+    """Batched s3_prefix_has_objects for listing pages.
+
+    Cached answers come from one MGET; the remaining prefixes are probed concurrently and
+    written back with the same TTL rules in one pipeline.
+    """
+
+    pfxs = list(dict.fromkeys(str(p or "").strip().lstrip("/") for p in prefixes))
+    out: dict[str, bool] = {p: False for p in pfxs}
+    pfxs = [p for p in pfxs if p]
+    if not pfxs:
+        return out
+
+    cache_keys = [f"s3:prefix_has_objects:{settings.s3_bucket}:{p}" for p in pfxs]
+    misses: list[int] = list(range(len(pfxs)))
+    try:
+        cached = get_redis().mget(cache_keys)
+        misses = []
+        for i, v in enumerate(cached):
+            if v is None:
+                misses.append(i)
+            else:
+                out[pfxs[i]] = str(v).strip() == "1"
+    except Exception:
+        pass
+
+    if not misses:
+        return out
+
+    def _probe(pfx: str) -> bool:
+        try:
+            resp = s3.list_objects_v2(Bucket=settings.s3_bucket, Prefix=pfx, MaxKeys=1)
+            return bool(resp.get("Contents") or [])
+        except Exception:
+            return False
+
+    try:
+        ensure_bucket_exists()
+        s3 = get_s3_client()
+        with ThreadPoolExecutor(max_workers=min(16, len(misses))) as ex:
+            found = list(ex.map(_probe, [pfxs[i] for i in misses]))
+    except Exception:
+        found = [False] * len(misses)
+
+    ttl = int(max(5, min(int(cache_seconds or 60), 3600)))
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for i, ok in zip(misses, found):
+            out[pfxs[i]] = ok
+            pipe.setex(cache_keys[i], ttl if ok else min(ttl, 5), "1" if ok else "0")
+        pipe.execute()
+    except Exception:
+        for i, ok in zip(misses, found):
+            out[pfxs[i]] = ok
+
+    return out
+
+
 def s3_list_objects(
     *,
     prefix: str,
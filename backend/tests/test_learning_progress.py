@@ -0,0 +1,94 @@
+import uuid
+
+from app.models.attempt import QuizAttempt
+from app.models.audit import LearningEvent, LearningEventType
+from app.models.module import Module, Submodule
+from app.models.quiz import Quiz, QuizType
+from app.models.user import User, UserRole
+from app.services.learning import LearningService
+
+
+def _quiz(db, qtype: QuizType = QuizType.submodule) -> Quiz:
+    q = Quiz(type=qtype, pass_threshold=70, time_limit=None, attempts_limit=3)
+    db.add(q)
+    db.flush()
+    return q
+
+
+def _module(db, title: str, final_quiz: Quiz | None = None) -> Module:
+    m = Module(
+        title=f"{title} {uuid.uuid4().hex[:6]}",
+        description=None,
+        difficulty=1,
+        category=None,
+        is_active=True,
+        final_quiz_id=final_quiz.id if final_quiz else None,
+    )
+    db.add(m)
+    db.flush()
+    return m
+
+
+def _lesson(db, m: Module, order: int, *, requires_quiz: bool = True) -> Submodule:
+    s = Submodule(
+        module_id=m.id, title=f"Lesson {order}", order=order, quiz_id=_quiz(db).id, content="", requires_quiz=requires_quiz
+    )
+    db.add(s)
+    db.flush()
+    return s
+
+
+def _attempt(db, user: User, quiz_id, *, score: int, passed: bool) -> None:
+    db.add(QuizAttempt(quiz_id=quiz_id, user_id=user.id, attempt_no=1, score=score, passed=passed))
+
+
+def _read(db, user: User, sub: Submodule) -> None:
+    db.add(LearningEvent(user_id=user.id, type=LearningEventType.submodule_opened, ref_id=sub.id, meta="read"))
+
+
+def test_get_modules_progress_edge_cases(db):
+    user = User(name=f"progress_{uuid.uuid4().hex[:8]}", role=UserRole.employee, password_hash="x")
+    db.add(user)
+    db.flush()
+
+    empty = _module(db, "Empty")
+
+    final_quiz = _quiz(db, QuizType.final)
+    final_only = _module(db, "Final only", final_quiz)
+    _attempt(db, user, final_quiz.id, score=40, passed=False)
+    _attempt(db, user, final_quiz.id, score=90, passed=True)
+
+    mixed = _module(db, "Mixed")
+    quiz_lesson = _lesson(db, mixed, 1)
+    materials = _lesson(db, mixed, 2, requires_quiz=False)
+    _attempt(db, user, quiz_lesson.quiz_id, score=80, passed=True)
+    _read(db, user, materials)
+    _read(db, user, materials)  # duplicate confirmation must not duplicate the lesson
+
+    unread = _module(db, "Unread")
+    unread_materials = _lesson(db, unread, 1, requires_quiz=False)
+
+    # Progress outside the requested modules must not leak in.
+    other = _module(db, "Other")
+    other_lesson = _lesson(db, other, 1)
+    _attempt(db, user, other_lesson.quiz_id, score=100, passed=True)
+    db.commit()
+
+    res = LearningService(db).get_modules_progress(user, [empty.id, final_only.id, mixed.id, unread.id])
+
+    assert set(res) == {empty.id, final_only.id, mixed.id, unread.id}
+    assert res[empty.id] == {"total": 0, "passed": 0, "completed": True, "submodules": []}
+    assert res[final_only.id] == {"total": 1, "passed": 1, "completed": True, "submodules": []}
+
+    assert res[mixed.id]["total"] == 2
+    assert res[mixed.id]["passed"] == 1
+    assert res[mixed.id]["completed"] is True
+    assert res[mixed.id]["submodules"] == [
+        {"submodule_id": str(quiz_lesson.id), "passed": True, "read": False},
+        {"submodule_id": str(materials.id), "passed": False, "read": True},
+    ]
+
+    assert res[unread.id]["completed"] is False
+    assert res[unread.id]["submodules"] == [
+        {"submodule_id": str(unread_materials.id), "passed": False, "read": False},
+    ]
@@ -0,0 +1,139 @@
+import time
+from types import SimpleNamespace
+
+from app.services.llm_handler import (
+    ProviderSpec,
+    _extract_abcd_options,
+    _filter_questions,
+    _first_acceptable,
+    _is_degenerate,
+    _try_provider,
+)
+
+
+def _q(prompt: str, correct_answer: str = "A", qtype: str = "single", explanation: str = "Because the text says so."):
+    return SimpleNamespace(type=qtype, prompt=prompt, correct_answer=correct_answer, explanation=explanation)
+
+
+_PROMPT = "Which statement matches the lesson?\nA) first option\nB) second option\nC) third option\nD) fourth option"
+
+
+def test_extract_abcd_options_accepts_common_formats():
+    prompt = "Stem line\na) one\nB. two\nC: three\nD — four"
+    assert _extract_abcd_options(prompt) == ["one", "two", "three", "four"]
+
+
+def test_extract_abcd_options_requires_all_four():
+    assert _extract_abcd_options("Stem\nA) one\nB) two\nC) three") is None
+
+
+def test_filter_questions_dedups_and_collects_letters():
+    items = [_q(_PROMPT, "A"), _q(_PROMPT, "B"), _q(_PROMPT.replace("lesson", "text"), "C)")]
+    valid, letters = _filter_questions(items, want=3)
+    assert len(valid) == 2
+    assert letters == {"A", "C"}
+
+
+def test_is_degenerate_only_for_three_or_more_same_letters():
+    prompts = [_PROMPT.replace("lesson", f"lesson {i}") for i in range(3)]
+    valid, letters = _filter_questions([_q(p, "B") for p in prompts], want=3)
+    assert _is_degenerate(valid, letters)
+    assert not _is_degenerate(valid[:2], letters)
+
+
+def test_filter_questions_stops_after_want():
+    class _Exploding:
+        @property
+        def type(self):
+            raise AssertionError("tail must not be validated")
+
+    valid, _letters = _filter_questions([_q(_PROMPT), _Exploding()], want=1)
+    assert len(valid) == 1
+
+
+def test_rate_slot_wait_is_capped_and_deducted_from_budget():
+    clock = {"left": 5.0}
+    waits: list[float] = []
+    calls: list[float | None] = []
+
+    def _acquire(max_wait_s: float) -> bool:
+        waits.append(max_wait_s)
+        clock["left"] -= 3.0  # the slot took 3s to free up
+        return True
+
+    def _call(debug, read_s):
+        calls.append(read_s)
+        return []
+
+    spec = ProviderSpec(name="p", enabled=True, per_attempt_s=20.0, min_read_s=0.5, call=_call, acquire=_acquire)
+    _try_provider(spec, want=1, min_q=1, max_tries=1, backoff=0.0, remaining=lambda: clock["left"], debug_out=None)
+
+    assert waits == [5.0]
+    # read timeout is sized from what is left after waiting, not before.
+    assert calls == [1.0]
+
+
+def test_no_call_when_rate_slot_wait_exhausts_budget():
+    clock = {"left": 2.0}
+    calls: list[float | None] = []
+
+    def _acquire(max_wait_s: float) -> bool:
+        clock["left"] = 0.0
+        return True
+
+    spec = ProviderSpec(
+        name="p", enabled=True, per_attempt_s=20.0, min_read_s=0.5, call=lambda d, r: calls.append(r) or [], acquire=_acquire
+    )
+    out, err = _try_provider(spec, want=1, min_q=1, max_tries=1, backoff=0.0, remaining=lambda: clock["left"], debug_out=None)
+
+    assert out == [] and err == "budget_exhausted"
+    assert calls == []
+
+
+def _questions(letters: str) -> list[SimpleNamespace]:
+    return [_q(_PROMPT.replace("lesson", f"lesson {i}"), letter) for i, letter in enumerate(letters)]
+
+
+def test_first_acceptable_returns_first_valid_result():
+    def _slow_good():
+        time.sleep(0.2)
+        return _questions("ABC")
+
+    def _bad():
+        return _questions("BBB")  # degenerate
+
+    def _boom():
+        raise RuntimeError("provider down")
+
+    winner, valid = _first_acceptable([_boom, _bad, _slow_good], want=3, min_q=3)
+    assert winner == 2
+    assert [q.correct_answer for q in valid] == ["A", "B", "C"]
+
+
+def test_first_acceptable_without_acceptable_result():
+    assert _first_acceptable([lambda: [], lambda: _questions("CCC")], want=3, min_q=3) == (-1, [])
+
+
+def test_degenerate_first_attempt_triggers_hedge():
+    calls = {"n": 0}
+
+    def _call(debug, read_s):
+        calls["n"] += 1
+        debug["raw"] = '{"questions": ["near-json placeholder"]}'
+        return _questions("BBB") if calls["n"] == 1 else _questions("ABC")
+
+    spec = ProviderSpec(
+        name="p",
+        enabled=True,
+        per_attempt_s=5.0,
+        min_read_s=0.5,
+        call=_call,
+        repair=lambda raw, debug, read_s: [],
+        hedge_repair=True,
+    )
+    debug: dict = {}
+    out, err = _try_provider(spec, want=3, min_q=3, max_tries=2, backoff=0.0, remaining=lambda: None, debug_out=debug)
+
+    assert err is None and len(out) == 3
+    assert debug["hedge_winner"] == "retry"
+    assert debug["p_attempts"] == 1
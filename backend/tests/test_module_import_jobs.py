@@ -0,0 +1,68 @@
+import io
+import zipfile
+
+import pytest
+
+from app.services.module_import_jobs import _copy_stored_member, _safe_extract_zip
+
+
+def _stored_zip(name: str, payload: bytes) -> tuple[bytes, zipfile.ZipInfo]:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as z:
+        z.writestr(name, payload)
+    data = buf.getvalue()
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        return data, z.infolist()[0]
+
+
+def test_copy_stored_member_copies_valid_entry(tmp_path):
+    data, member = _stored_zip("lesson/notes.txt", b"hello world" * 100)
+    target = tmp_path / "out"
+    assert _copy_stored_member(member=member, target=target, data=data, raw_fd=None)
+    assert target.read_bytes() == b"hello world" * 100
+
+
+def test_copy_stored_member_rejects_bad_crc(tmp_path):
+    data, member = _stored_zip("lesson/notes.txt", b"hello world" * 100)
+    corrupt = data.replace(b"hello", b"jello", 1)
+    with pytest.raises(zipfile.BadZipFile):
+        _copy_stored_member(member=member, target=tmp_path / "out", data=corrupt, raw_fd=None)
+
+
+def test_copy_stored_member_rejects_header_name_mismatch(tmp_path):
+    data, member = _stored_zip("lesson/notes.txt", b"payload")
+    tampered = data.replace(b"lesson/notes.txt", b"lesson/other.txt", 1)
+    with pytest.raises(zipfile.BadZipFile):
+        _copy_stored_member(member=member, target=tmp_path / "out", data=tampered, raw_fd=None)
+
+
+def _zip_with(names: list[str]) -> zipfile.ZipFile:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for n in names:
+            z.writestr(zipfile.ZipInfo(n), b"x")
+    buf.seek(0)
+    return zipfile.ZipFile(buf, "r")
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["../evil.txt", "lesson/../../evil.txt", "..\\evil.txt", "/abs.txt", "C:/evil.txt", "C:\\evil.txt", "c:evil.txt"],
+)
+def test_safe_extract_zip_skips_escaping_entries(tmp_path, name):
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    with _zip_with([name, "lesson/ok.txt"]) as zf:
+        _safe_extract_zip(zf=zf, dest=dest)
+
+    written = sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*") if p.is_file())
+    assert written == ["dest/lesson/ok.txt"]
+
+
+def test_safe_extract_zip_extracts_nested_paths(tmp_path):
+    names = ["Module/01 Intro/theory.docx", "Module/01 Intro/media/clip.mp4", "Module/_module/guide.pdf"]
+    with _zip_with(names) as zf:
+        _safe_extract_zip(zf=zf, dest=tmp_path)
+
+    for n in names:
+        assert (tmp_path / n).read_bytes() == b"x"
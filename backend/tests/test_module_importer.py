@@ -0,0 +1,26 @@
+from pathlib import Path
+
+import pytest
+
+from app.services.module_importer import _content_type
+
+
+@pytest.mark.parametrize(
+    ("name", "prefix"),
+    [
+        ("lesson.AVI", "video/"),
+        ("clip.mpg", "video/"),
+        ("scan.tif", "image/"),
+        ("photo.bmp", "image/"),
+        ("track.flac", "audio/"),
+        ("slides.pdf", "application/pdf"),
+    ],
+)
+def test_content_type_keeps_previewable_media_types(name, prefix):
+    assert _content_type(Path(name)).startswith(prefix)
+
+
+def test_content_type_falls_back_to_mimetypes_then_octet_stream():
+    # Not in the fast-path map, but known to the stdlib registry.
+    assert _content_type(Path("favicon.ico")).startswith("image/")
+    assert _content_type(Path("blob.unknownext")) == "application/octet-stream"